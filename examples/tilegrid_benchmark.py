@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# TileGrid Culling Benchmark
+#
+# To the extent possible under law, the author(s) have dedicated all
+# copyright and related and neighboring rights to this software to the
+# public domain worldwide. This software is distributed without any
+# warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication
+# along with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# This script compares, for each render method of sge.gfx.TileGrid, the
+# number of tiles the Pygame SGE draws for a view against the number of
+# tiles which are actually visible in it, and times drawing the grid.
+# It uses internal functions of the Pygame SGE, so it is not an example
+# of how the SGE should normally be used.
+
+
+import random
+import time
+
+import pygame
+
+import sge
+from sge import r
+
+
+SCREEN_WIDTH = 640
+SCREEN_HEIGHT = 480
+GRID_SIZE = 300
+TILE_WIDTH = 32
+TILE_HEIGHT = 32
+META = 8
+FRAMES = 100
+
+
+def get_visible_count(grid, x, y):
+    # Count the tiles which overlap the screen by checking every tile.
+    tw = grid.tile_width
+    th = grid.tile_height
+    count = 0
+    for j in range(len(grid.tiles) // grid.section_length):
+        for i in range(grid.section_length):
+            if grid.render_method == "isometric":
+                tile_x = x + i*tw + (j % 2) * tw/2
+                tile_y = y + j*th/2
+            elif grid.render_method == "hexagonal":
+                tile_x = x + i * (tw - grid.meta)
+                tile_y = y + j*th + (i % 2) * th/2
+            elif grid.render_method == "isohex":
+                tile_x = x + i*tw + (j % 2) * tw/2
+                tile_y = y + j * (th - grid.meta)
+            else:
+                tile_x = x + i*tw
+                tile_y = y + j*th
+
+            if (tile_x < SCREEN_WIDTH and tile_x + tw > 0 and
+                    tile_y < SCREEN_HEIGHT and tile_y + th > 0):
+                count += 1
+
+    return count
+
+
+def main():
+    sge.dsp.Game(width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
+    tile = sge.gfx.Sprite(width=TILE_WIDTH, height=TILE_HEIGHT)
+    tile.draw_polygon([(TILE_WIDTH / 2, 0), (TILE_WIDTH, TILE_HEIGHT / 2),
+                       (TILE_WIDTH / 2, TILE_HEIGHT), (0, TILE_HEIGHT / 2)],
+                      fill=sge.gfx.Color("olive"))
+    tiles = [tile] * (GRID_SIZE*GRID_SIZE)
+    dest = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    positions = [(-random.uniform(0, GRID_SIZE*TILE_WIDTH / 2),
+                  -random.uniform(0, GRID_SIZE*TILE_HEIGHT / 2))
+                 for _ in range(FRAMES)]
+
+    print("{:<12} {:>12} {:>12} {:>12}".format(
+        "method", "drawn", "visible", "ms/frame"))
+    for method in ["orthogonal", "isometric", "hexagonal", "isohex"]:
+        grid = sge.gfx.TileGrid(tiles, render_method=method,
+                                section_length=GRID_SIZE,
+                                tile_width=TILE_WIDTH,
+                                tile_height=TILE_HEIGHT, meta=META)
+        drawn = 0
+        visible = 0
+        for x, y in positions[:5]:
+            drawn += len(list(r.tg_get_visible(grid, x, y, SCREEN_WIDTH,
+                                                SCREEN_HEIGHT)))
+            visible += get_visible_count(grid, x, y)
+
+        start = time.perf_counter()
+        for x, y in positions:
+            r.tg_blit(grid, dest, x, y)
+        frame_time = (time.perf_counter() - start) / FRAMES * 1000
+
+        print("{:<12} {:>12} {:>12} {:>12.2f}".format(
+            method, drawn // 5, visible // 5, frame_time))
+
+
+if __name__ == '__main__':
+    main()
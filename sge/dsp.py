@@ -19,9 +19,14 @@ This module provides classes related to the graphical display.
 
 
 __all__ = ["Game", "Room", "View", "Object", "list_fullscreen_modes",
-           "fullscreen_mode_ok"]
+           "fullscreen_mode_ok", "set_cache_budget", "get_cache_stats",
+           "reset_cache_stats", "set_cache_log", "preload",
+           "get_preload_progress", "wait_preload", "set_asset_cache",
+           "register_transition"]
 
 
+import concurrent.futures
+import functools
 import math
 import os
 import sys
@@ -33,19 +38,18 @@ import pygame
 import sge
 from sge import gfx, r
 from sge.r import (
-    _check_color, _scale, _get_blend_flags, _screen_blend, _apply_shader,
+    _check_color, _scale_blit, _get_blend_flags, _screen_blend, _apply_shader,
     _set_mode, _handle_music, _deinit_sound, _reinit_sound, _get_dot_sprite,
     _get_line_sprite, _get_rectangle_sprite, _get_ellipse_sprite,
-    _get_circle_sprite, _get_polyline_sprite, _get_polygon_sprite, bl_update,
+    _get_circle_sprite, _get_polyline_sprite, _get_polygon_sprite,
+    _get_dot_primitive, _get_line_primitive, _get_rectangle_primitive,
+    _get_ellipse_primitive, _get_circle_primitive, _get_polyline_primitive,
+    _get_polygon_primitive, _draw_primitive, _preload, s_find_files, bl_update,
     bl_get_image, o_update, o_detect_collisions, o_update_collision_lists,
     o_update_object_areas, o_is_other, o_get_origin_offset, o_set_speed,
     s_get_image, s_get_precise_mask, s_from_text, tg_blit,
-    r_get_rectangle_object_areas, r_set_object_areas, r_update_fade,
-    r_update_dissolve, r_update_pixelate, r_update_wipe_left,
-    r_update_wipe_right, r_update_wipe_up, r_update_wipe_down,
-    r_update_wipe_upleft, r_update_wipe_upright, r_update_wipe_downleft,
-    r_update_wipe_downright, r_update_wipe_matrix, r_update_iris_in,
-    r_update_iris_out, v_limit)
+    r_get_rectangle_object_areas, r_set_object_areas, r_update_custom,
+    v_get_surface, v_limit)
 
 
 class Game:
@@ -149,6 +153,26 @@ class Game:
        either an unsupported value or ``None``, the fastest available
        scale method is chosen.
 
+    .. attribute:: hardware_rendering
+
+       Whether or not to request that scaling the display to the window
+       be done by the graphics hardware rather than in software.  This
+       makes scaling cost almost nothing, which is especially useful
+       for high resolution fullscreen displays.
+
+       The value of this attribute is only a request.  If hardware
+       rendering is unavailable (for example, when no real display is
+       present), a warning is issued and software rendering is used
+       instead.
+
+       .. note::
+
+          When hardware rendering is used, scaling is always
+          proportional and :attr:`scale_integer` has no effect.  The
+          only scale methods available are ``"noblur"`` and
+          ``"smooth"``; any other value of :attr:`scale_method` is
+          treated as ``"noblur"``.
+
     .. attribute:: fps
 
        The rate the game should run in frames per second.
@@ -363,6 +387,16 @@ class Game:
             r.game_scale_method = value
             _set_mode()
 
+    @property
+    def hardware_rendering(self):
+        return r.game_hardware_rendering
+
+    @hardware_rendering.setter
+    def hardware_rendering(self, value):
+        if value != r.game_hardware_rendering:
+            r.game_hardware_rendering = value
+            _set_mode()
+
     @property
     def grab_input(self):
         return pygame.event.get_grab()
@@ -420,7 +454,8 @@ class Game:
                  scale_method=None, fps=60, delta=False, delta_min=15,
                  delta_max=None, grab_input=False, window_text=None,
                  window_icon=None, collision_events_enabled=True,
-                 sampling_frequency=44100, stereo=True):
+                 sampling_frequency=44100, stereo=True,
+                 hardware_rendering=False):
         """
         Arguments set the respective initial attributes of the game.
         See the documentation for :class:`sge.dsp.Game` for more
@@ -450,6 +485,7 @@ class Game:
         r.game_scale_proportional = scale_proportional
         r.game_scale_integer = scale_integer
         r.game_scale_method = scale_method
+        r.game_hardware_rendering = hardware_rendering
         r.game_new_room = None
         self.fps = fps
         self.delta = delta
@@ -739,7 +775,9 @@ class Game:
                         complete = rd["t_time_passed"] / rd["t_duration"]
                         rd["t_update"](self.current_room, complete)
                         rd["t_complete_last"] = complete
-                        self.project_sprite(rd["t_sprite"], 0, 0, 0)
+                        r.game_window_projections.append(
+                            (rd["t_sprite"].rd["baseimages"][0], 0, 0, 0,
+                             None))
                     else:
                         rd["t_update"] = None
 
@@ -774,8 +812,9 @@ class Game:
         with them.
         """
         if sprite is None:
-            font = gfx.Font("Droid Sans", size=64)
-            sprite = gfx.Sprite.from_text(font, "Paused")
+            if r.game_pause_font is None:
+                r.game_pause_font = gfx.Font("Droid Sans", size=64)
+            sprite = gfx.Sprite.from_text(r.game_pause_font, "Paused")
 
         r.game_paused = True
 
@@ -1186,6 +1225,12 @@ class Game:
             r.cache.prune_time = 0
             r.cache.prune()
 
+        if r.cache.log_interval is not None:
+            r.cache.log_time += tp
+            if r.cache.log_time >= r.cache.log_interval:
+                r.cache.log_time = 0
+                r.cache.log_stats()
+
         return tp
 
     def refresh(self):
@@ -1212,6 +1257,43 @@ class Game:
         # Clear display surface
         display_surface.fill((0, 0, 0))
 
+        # Find the image and position of every object visible in any
+        # view once, rather than once for each view.
+        visible_objects = set()
+        for view in self.current_room.views:
+            visible_objects |= self.current_room.get_objects_at(
+                view.x, view.y, view.width, view.height)
+
+        object_images = []
+        for obj in visible_objects:
+            if obj.visible and obj is not self.mouse:
+                if isinstance(obj.sprite, sge.gfx.Sprite):
+                    img = s_get_image(obj.sprite, obj.image_index,
+                                      obj.image_xscale, obj.image_yscale,
+                                      obj.image_rotation, obj.image_alpha,
+                                      obj.image_blend, obj.image_blend_mode)
+                    w = img.get_width()
+                    h = img.get_height()
+                    x = obj.x - obj.image_origin_x
+                    y = obj.y - obj.image_origin_y
+                    if obj.image_rotation:
+                        nimg = s_get_image(obj.sprite, obj.image_index,
+                                           obj.image_xscale,
+                                           obj.image_yscale)
+                        xoff = (w - nimg.get_width()) / 2
+                        yoff = (h - nimg.get_height()) / 2
+                    else:
+                        xoff = 0
+                        yoff = 0
+
+                    object_images.append(((img, x - xoff, y - yoff, obj.z,
+                                           None), x, y, w, h))
+                elif isinstance(obj.sprite, sge.gfx.TileGrid):
+                    x = obj.x - obj.image_origin_x
+                    y = obj.y - obj.image_origin_y
+                    object_images.append(((obj.sprite, x, y, obj.z, None),
+                                          None, None, None, None))
+
         # Draw views
         for view in self.current_room.views:
             if (view.xport == 0 and view.yport == 0 and
@@ -1219,7 +1301,7 @@ class Game:
                     view.hport == view.height == self.height):
                 view_surf = display_surface
             else:
-                view_surf = pygame.Surface((view.width, view.height))
+                view_surf = v_get_surface(view, display_surface)
             view_surf.fill(pygame.Color(*self.current_room.background.color))
             view_x = view.x
             view_y = view.y
@@ -1276,34 +1358,11 @@ class Game:
                         images.append((img, x + math.floor(view_x),
                                        y + math.floor(view_y), layer.z, None))
 
-            for obj in self.current_room.get_objects_at(
-                    view_x, view_y, view_width, view_height):
-                if obj.visible and obj is not self.mouse:
-                    if isinstance(obj.sprite, sge.gfx.Sprite):
-                        img = s_get_image(obj.sprite, obj.image_index,
-                                          obj.image_xscale, obj.image_yscale,
-                                          obj.image_rotation, obj.image_alpha,
-                                          obj.image_blend,
-                                          obj.image_blend_mode)
-                        w = img.get_width()
-                        h = img.get_height()
-                        x = obj.x - obj.image_origin_x
-                        y = obj.y - obj.image_origin_y
-                        if (x + w >= view_x and x <= view_x + view_width and
-                                y + h >= view_y and y <= view_y + view_height):
-                            nimg = s_get_image(obj.sprite, obj.image_index,
-                                               obj.image_xscale,
-                                               obj.image_yscale)
-                            nw = nimg.get_width()
-                            nh = nimg.get_height()
-                            xoff = (w - nw) / 2
-                            yoff = (h - nh) / 2
-                            images.append((img, x - xoff, y - yoff,
-                                           obj.z, None))
-                    elif isinstance(obj.sprite, sge.gfx.TileGrid):
-                        x = obj.x - obj.image_origin_x
-                        y = obj.y - obj.image_origin_y
-                        images.append((obj.sprite, x, y, obj.z, None))
+            for image, x, y, w, h in object_images:
+                if (w is None or
+                        (x + w >= view_x and x <= view_x + view_width and
+                         y + h >= view_y and y <= view_y + view_height)):
+                    images.append(image)
 
             images.extend(self.current_room.rd["projections"])
 
@@ -1315,6 +1374,8 @@ class Game:
                 y = img[2] - view.y
                 if isinstance(surf, sge.gfx.TileGrid):
                     tg_blit(surf, view_surf, x, y)
+                elif isinstance(surf, tuple):
+                    _draw_primitive(view_surf, surf, x, y)
                 else:
                     blend_mode = img[4]
                     if blend_mode == sge.BLEND_RGB_SCREEN:
@@ -1326,9 +1387,9 @@ class Game:
                         view_surf.blit(surf, (int(x), int(y)), None, flags)
 
             if view_surf is not display_surface:
-                display_surface.blit(
-                    _scale(view_surf, view.wport, view.hport),
-                    (int(view.xport), int(view.yport)))
+                _scale_blit(display_surface, view_surf, view.xport,
+                            view.yport, view.wport, view.hport,
+                            view.rd["scale_buffers"])
 
         self.current_room.rd["projections"] = []
 
@@ -1337,6 +1398,12 @@ class Game:
         r.game_window_projections.sort(key=lambda img: img[3])
         for projection in r.game_window_projections:
             image, x, y, z, blend_mode = projection
+            if isinstance(image, tuple):
+                # Primitives are positioned relative to their origin, so
+                # they need the exact position.
+                _draw_primitive(display_surface, image, x, y)
+                continue
+
             x = int(x)
             y = int(y)
             if isinstance(image, sge.gfx.TileGrid):
@@ -1357,9 +1424,8 @@ class Game:
         real_h = self.height * r.game_yscale
         if display_surface is not r.game_window:
             r.game_window.fill((0, 0, 0))
-            r.game_window.blit(
-                _scale(display_surface, real_w, real_h),
-                (int(r.game_x), int(r.game_y)))
+            _scale_blit(r.game_window, display_surface, r.game_x, r.game_y,
+                        real_w, real_h, r._scale_buffers)
 
         pygame.display.flip()
 
@@ -1389,6 +1455,11 @@ class Game:
         more information.
         """
         _check_color(color)
+        primitive = _get_dot_primitive(color, blend_mode)
+        if primitive is not None:
+            r.game_window_projections.append((primitive, x, y, z, None))
+            return
+
         sprite = _get_dot_sprite(color)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
 
@@ -1423,6 +1494,12 @@ class Game:
         x2 -= x
         y2 -= y
 
+        primitive = _get_line_primitive(x1, y1, x2, y2, color, thickness,
+                                        anti_alias, blend_mode)
+        if primitive is not None:
+            r.game_window_projections.append((primitive, x, y, z, None))
+            return
+
         sprite = _get_line_sprite(x1, y1, x2, y2, color, thickness, anti_alias)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
 
@@ -1450,6 +1527,12 @@ class Game:
         draw_y = outline_thickness // 2
         x -= draw_x
         y -= draw_y
+        primitive = _get_rectangle_primitive(
+            width, height, fill, outline, outline_thickness, blend_mode)
+        if primitive is not None:
+            r.game_window_projections.append((primitive, x, y, z, None))
+            return
+
         sprite = _get_rectangle_sprite(width, height, fill, outline,
                                        outline_thickness)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
@@ -1489,6 +1572,13 @@ class Game:
         draw_y = outline_thickness // 2
         x -= draw_x
         y -= draw_y
+        primitive = _get_ellipse_primitive(
+            width, height, fill, outline, outline_thickness, anti_alias,
+            blend_mode)
+        if primitive is not None:
+            r.game_window_projections.append((primitive, x, y, z, None))
+            return
+
         sprite = _get_ellipse_sprite(width, height, fill, outline,
                                      outline_thickness, anti_alias)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
@@ -1512,6 +1602,13 @@ class Game:
         """
         _check_color(fill)
         _check_color(outline)
+        primitive = _get_circle_primitive(
+            radius, fill, outline, outline_thickness, anti_alias, blend_mode)
+        if primitive is not None:
+            r.game_window_projections.append(
+                (primitive, x - radius, y - radius, z, None))
+            return
+
         sprite = _get_circle_sprite(radius, fill, outline, outline_thickness,
                                     anti_alias)
         self.project_sprite(sprite, 0, x - radius, y - radius, z,
@@ -1545,6 +1642,12 @@ class Game:
         x = min(xlist)
         y = min(ylist)
 
+        primitive = _get_polyline_primitive(points, color, thickness,
+                                            anti_alias, blend_mode)
+        if primitive is not None:
+            r.game_window_projections.append((primitive, x, y, z, None))
+            return
+
         sprite = _get_polyline_sprite(points, color, thickness, anti_alias)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
 
@@ -1576,6 +1679,12 @@ class Game:
         x = min(xlist)
         y = min(ylist)
 
+        primitive = _get_polygon_primitive(
+            points, fill, outline, outline_thickness, anti_alias, blend_mode)
+        if primitive is not None:
+            r.game_window_projections.append((primitive, x, y, z, None))
+            return
+
         sprite = _get_polygon_sprite(points, fill, outline, outline_thickness,
                                      anti_alias)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
@@ -2204,7 +2313,9 @@ class Room:
           - ``"iris_in"``
           - ``"iris_out"``
 
-          If an unsupported value is given, default to ``None``.
+          Transitions added with :func:`sge.dsp.register_transition`
+          can also be used.  If an unsupported value is given, default
+          to ``None``.
 
         - ``transition_time`` -- The time the transition should take in
           milliseconds.  Has no effect if ``transition`` is ``None``.
@@ -2225,28 +2336,27 @@ class Room:
             ``y`` is the vertical location relative to the window.
             Default is the center of the window.
         """
-        transitions = {
-            "fade": r_update_fade, "dissolve": r_update_dissolve,
-            "pixelate": r_update_pixelate, "wipe_left": r_update_wipe_left,
-            "wipe_right": r_update_wipe_right, "wipe_up": r_update_wipe_up,
-            "wipe_down": r_update_wipe_down,
-            "wipe_upleft": r_update_wipe_upleft,
-            "wipe_upright": r_update_wipe_upright,
-            "wipe_downleft": r_update_wipe_downleft,
-            "wipe_downright": r_update_wipe_downright,
-            "wipe_matrix": r_update_wipe_matrix,
-            "iris_in": r_update_iris_in, "iris_out": r_update_iris_out}
-
-        if transition in transitions and transition_time > 0:
-            self.rd["t_update"] = transitions[transition]
-            self.rd["t_sprite"] = gfx.Sprite.from_screenshot()
-            self.rd["t_sprite_original"] = self.rd["t_sprite"].copy()
+        update = r.game_transitions.get(transition)
+        if update is not None and transition_time > 0:
+            # The transition draws directly on the screenshot's image,
+            # which is projected as is.
+            sprite = gfx.Sprite.from_screenshot()
+            image = sprite.rd["baseimages"][0].convert_alpha()
+            sprite.rd["baseimages"][0] = image
+            original = gfx.Sprite(width=sprite.width, height=sprite.height)
+            original.rd["baseimages"][0] = image.copy()
+
+            self.rd["t_update"] = update
+            self.rd["t_sprite"] = sprite
+            self.rd["t_sprite_original"] = original
+            self.rd["t_scratch"] = None
             self.rd["t_duration"] = transition_time
             self.rd["t_arg"] = transition_arg
             self.rd["t_meta"] = None
             self.rd["t_time_passed"] = 0
             self.rd["t_complete_last"] = 0
-            self.rd["t_matrix_remaining"] = None
+            self.rd["t_matrix"] = None
+            self.rd["t_matrix_next"] = 0
         else:
             self.rd["t_update"] = None
 
@@ -2300,6 +2410,11 @@ class Room:
         more information.
         """
         _check_color(color)
+        primitive = _get_dot_primitive(color, blend_mode)
+        if primitive is not None:
+            self.rd["projections"].append((primitive, x, y, z, None))
+            return
+
         sprite = _get_dot_sprite(color)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
 
@@ -2333,6 +2448,12 @@ class Room:
         x2 -= x
         y2 -= y
 
+        primitive = _get_line_primitive(x1, y1, x2, y2, color, thickness,
+                                        anti_alias, blend_mode)
+        if primitive is not None:
+            self.rd["projections"].append((primitive, x, y, z, None))
+            return
+
         sprite = _get_line_sprite(x1, y1, x2, y2, color, thickness, anti_alias)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
 
@@ -2359,6 +2480,12 @@ class Room:
         draw_y = outline_thickness // 2
         x -= draw_x
         y -= draw_y
+        primitive = _get_rectangle_primitive(
+            width, height, fill, outline, outline_thickness, blend_mode)
+        if primitive is not None:
+            self.rd["projections"].append((primitive, x, y, z, None))
+            return
+
         sprite = _get_rectangle_sprite(width, height, fill, outline,
                                        outline_thickness)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
@@ -2392,6 +2519,13 @@ class Room:
         draw_y = outline_thickness // 2
         x -= draw_x
         y -= draw_y
+        primitive = _get_ellipse_primitive(
+            width, height, fill, outline, outline_thickness, anti_alias,
+            blend_mode)
+        if primitive is not None:
+            self.rd["projections"].append((primitive, x, y, z, None))
+            return
+
         sprite = _get_ellipse_sprite(width, height, fill, outline,
                                      outline_thickness, anti_alias)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
@@ -2414,6 +2548,13 @@ class Room:
         """
         _check_color(fill)
         _check_color(outline)
+        primitive = _get_circle_primitive(
+            radius, fill, outline, outline_thickness, anti_alias, blend_mode)
+        if primitive is not None:
+            self.rd["projections"].append(
+                (primitive, x - radius, y - radius, z, None))
+            return
+
         sprite = _get_circle_sprite(radius, fill, outline, outline_thickness,
                                     anti_alias)
         self.project_sprite(sprite, 0, x - radius, y - radius, z,
@@ -2445,6 +2586,12 @@ class Room:
         x = min(xlist)
         y = min(ylist)
 
+        primitive = _get_polyline_primitive(points, color, thickness,
+                                            anti_alias, blend_mode)
+        if primitive is not None:
+            self.rd["projections"].append((primitive, x, y, z, None))
+            return
+
         sprite = _get_polyline_sprite(points, color, thickness, anti_alias)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
 
@@ -2475,6 +2622,12 @@ class Room:
         x = min(xlist)
         y = min(ylist)
 
+        primitive = _get_polygon_primitive(
+            points, fill, outline, outline_thickness, anti_alias, blend_mode)
+        if primitive is not None:
+            self.rd["projections"].append((primitive, x, y, z, None))
+            return
+
         sprite = _get_polygon_sprite(points, fill, outline, outline_thickness,
                                      anti_alias)
         self.project_sprite(sprite, 0, x, y, z, blend_mode=blend_mode)
@@ -2939,6 +3092,8 @@ class View:
         self.rd = {}
         self.rd["x"] = x
         self.rd["y"] = y
+        self.rd["surface"] = None
+        self.rd["scale_buffers"] = {}
         self.xport = xport
         self.yport = yport
         self.__width = width if width else sge.game.width - xport
@@ -4429,3 +4584,286 @@ def fullscreen_mode_ok(width, height):
     """
     return bool(pygame.display.mode_ok(
         (int(width), int(height)), pygame.FULLSCREEN))
+
+
+def set_cache_budget(category, size):
+    """
+    Set how much memory the SGE may use to cache a category of
+    generated graphics.
+
+    The SGE caches transformed images, collision masks, text, and
+    shapes so that they don't have to be generated again every frame.
+    Each of these categories has its own memory budget; when a category
+    goes over its budget, the cached items which were used least
+    recently are discarded.  Items which go unused for a while are also
+    discarded regardless of the budget.
+
+    Parameters:
+
+    - ``category`` -- The category to set the budget of.  Can be one of
+      the following:
+
+      - ``"images"`` -- Scaled, rotated, and blended sprite images.
+      - ``"masks"`` -- Collision masks.
+      - ``"text"`` -- Text rendered by :meth:`sge.gfx.Sprite.from_text`
+        and the ``project_text`` methods.
+      - ``"shapes"`` -- Shapes drawn by the other ``project_*``
+        methods.
+      - ``"tiles"`` -- Chunks of :class:`sge.gfx.TileGrid` objects (see
+        :attr:`sge.gfx.TileGrid.chunk_size`).
+      - ``"misc"`` -- Everything else.
+
+    - ``size`` -- The budget in bytes.  Setting this to ``0`` disables
+      caching for the category.
+
+    .. note::
+
+       Sizes are estimates based on the pixel data of cached images and
+       the dimensions of cached masks, so actual memory use can be
+       somewhat higher.
+    """
+    r.cache.set_budget(category, size)
+
+
+def get_cache_stats():
+    """
+    Return statistics about the cache used for generated graphics.
+
+    The return value is a dictionary with a key for each category
+    which can be passed to :func:`sge.dsp.set_cache_budget`.  Each of
+    its values is in turn a dictionary containing the following keys:
+
+    - ``"hits"`` -- How many times a cached item was found.
+    - ``"misses"`` -- How many times a cached item was looked for, but
+      had to be generated.
+    - ``"inserts"`` -- How many items have been added.
+    - ``"evictions"`` -- How many items have been discarded to keep
+      the category within its budget.
+    - ``"expirations"`` -- How many items have been discarded because
+      they went unused for a while.
+    - ``"rejections"`` -- How many items were not cached because they
+      were larger than the entire budget.
+    - ``"entries"`` -- How many items are currently cached.
+    - ``"bytes"`` -- The estimated memory used by the items currently
+      cached in bytes.
+    - ``"budget"`` -- The budget of the category in bytes.
+
+    All counters start at the time the SGE is imported, or the last
+    time :func:`sge.dsp.reset_cache_stats` was called.
+    """
+    return r.cache.get_stats()
+
+
+def reset_cache_stats():
+    """
+    Reset all counters returned by :func:`sge.dsp.get_cache_stats` to
+    zero.  Cached items are not affected.
+    """
+    r.cache.reset_stats()
+
+
+def set_cache_log(interval, function=None):
+    """
+    Set how often to log cache statistics.
+
+    Parameters:
+
+    - ``interval`` -- The time in milliseconds between each time the
+      statistics returned by :func:`sge.dsp.get_cache_stats` are
+      logged.  Set to :const:`None` to stop logging them.
+    - ``function`` -- The function to call with a summary of the
+      statistics as a string each time they are logged, for instance
+      :func:`print` or the ``info`` method of a
+      :class:`logging.Logger`.  If set to :const:`None`, the summary
+      is issued as a warning with :func:`warnings.warn` instead.
+
+    Statistics are logged from :meth:`sge.dsp.Game.regulate_speed`,
+    so they are only logged while the game is running.
+    """
+    r.cache.log_interval = interval
+    r.cache.log_time = 0
+    r.cache.log_function = function
+
+
+def preload(sprites=(), sounds=(), threads=None):
+    """
+    Start loading image and sound files in the background.
+
+    Decoding image and sound files can take a long time, which can make
+    a game freeze while it creates all of its sprites and sounds.  This
+    function loads the files used by the indicated sprites and sounds
+    on a pool of threads instead, so that the game can keep running
+    (for instance, to show a loading screen) in the meantime.  When a
+    :class:`sge.gfx.Sprite` or :class:`sge.snd.Sound` is created later
+    from a file that has been preloaded, the loaded data is used
+    instead of loading the file again, waiting for it to finish loading
+    if necessary.
+
+    Parameters:
+
+    - ``sprites`` -- A list of the sprites to preload.  Each item can
+      be either the name of a sprite in the current directory, or a
+      tuple containing the name and directory of a sprite, as passed to
+      :meth:`sge.gfx.Sprite.__init__`.  File names of tilesets, as
+      passed to :meth:`sge.gfx.Sprite.from_tileset`, can also be used
+      as names.
+    - ``sounds`` -- A list of the file names of the sounds to preload,
+      as passed to :meth:`sge.snd.Sound.__init__`.  Sounds are only
+      preloaded if the sound system is initialized.
+    - ``threads`` -- The number of threads to load the files with, or
+      :const:`None` to choose automatically based on the number of
+      processors.
+
+    Preloaded files are kept in memory until they are used, so only
+    files which are going to be used should be preloaded.  Errors which
+    occur while loading a file are raised when a sprite or sound is
+    created from it.
+
+    See also: :func:`sge.dsp.get_preload_progress`,
+    :func:`sge.dsp.wait_preload`
+
+    .. note::
+
+       Music is streamed from its file while it is playing rather than
+       loaded in advance, so :class:`sge.snd.Music` objects do not
+       benefit from preloading.
+    """
+    if all(future.done() for future in r._preload_futures):
+        del r._preload_futures[:]
+
+    fnames = []
+    for sprite in sprites:
+        if isinstance(sprite, str):
+            name = sprite
+            directory = ""
+        else:
+            name, directory = sprite
+
+        if os.path.isfile(os.path.join(directory, name)):
+            fnames.append(os.path.join(directory, name))
+            continue
+
+        try:
+            single, frames, strips = s_find_files(name, directory)
+        except OSError:
+            continue
+
+        fnames.extend(single or [fname for fname in frames if fname] or
+                      strips)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+    for fname in fnames:
+        _preload("image", fname, executor)
+
+    if pygame.mixer.get_init():
+        for fname in sounds:
+            if fname is not None:
+                _preload("sound", fname, executor)
+
+    executor.shutdown(wait=False)
+
+
+def get_preload_progress():
+    """
+    Return how much of the files being loaded by
+    :func:`sge.dsp.preload` have been loaded so far as a number from
+    ``0`` to ``1``.  This includes all calls to :func:`sge.dsp.preload`
+    since the last time all preloaded files were finished loading.
+
+    If there are no files being loaded, ``1`` is returned.
+    """
+    if not r._preload_futures:
+        return 1
+
+    done = sum(1 for future in r._preload_futures if future.done())
+    return done / len(r._preload_futures)
+
+
+def wait_preload():
+    """
+    Wait until all files being loaded by :func:`sge.dsp.preload` have
+    finished loading.
+    """
+    concurrent.futures.wait(r._preload_futures)
+
+
+def set_asset_cache(directory):
+    """
+    Set the directory to keep the on-disk asset cache in.
+
+    Loading a sprite from image files involves decoding the files and
+    scaling the images, and detecting collisions with a sprite's
+    precise shape involves building masks of its frames.  When the
+    asset cache is enabled, the results of this work are saved as raw
+    data in the asset cache, and the next time the same sprite is
+    loaded (for instance, the next time the game is started), the
+    saved data is mapped directly into memory instead of being
+    generated again.
+
+    Parameters:
+
+    - ``directory`` -- The directory to keep the asset cache in.  It
+      is created if it does not exist.  Set to :const:`None` to disable
+      the asset cache.
+
+    Cached data is identified by the names and contents of the image
+    files it was made from and the arguments they were loaded with, so
+    changing an image file automatically causes the sprite to be
+    loaded from it again.  The contents of an image file are only read
+    to identify it again after its size or modification time changes.
+    Data which is no longer used is not removed automatically, so the
+    directory should be deleted from time to time if its image files
+    change often.
+
+    By default, the asset cache is disabled.
+
+    .. note::
+
+       Only sprites loaded with :meth:`sge.gfx.Sprite.__init__` are
+       cached.  Masks of scaled or rotated frames are only cached if
+       the sprite's :attr:`sge.gfx.Sprite.scale_step` or
+       :attr:`sge.gfx.Sprite.rotation_step`, respectively, is set, since
+       there would otherwise be no limit to how many of them are saved.
+       The asset cache takes about as much disk space as the
+       sprites take memory, which is usually much more than the image
+       files themselves.
+    """
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+
+    r._asset_cache_dir = directory
+
+
+def register_transition(name, update):
+    """
+    Add a transition which can be used by :meth:`sge.dsp.Room.start`.
+
+    Parameters:
+
+    - ``name`` -- The name of the transition, to be passed as the
+      ``transition`` argument of :meth:`sge.dsp.Room.start`.  If a
+      transition with this name already exists, it is replaced.
+    - ``update`` -- The function to call to update the transition.
+
+    During a transition, a sprite containing the last image shown
+    before the transition started is drawn over the room being
+    started, and ``update`` is called once every frame to change it.
+    It is passed the following arguments:
+
+    - ``sprite`` -- The sprite drawn over the room.  Changes made to
+      it remain for the rest of the transition, so typically,
+      ``update`` erases the part of it which should no longer be
+      visible with :meth:`sge.gfx.Sprite.draw_erase` or draws over it
+      with other drawing methods.
+    - ``original`` -- A sprite containing the image ``sprite`` had at
+      the start of the transition, which should not be changed.
+    - ``complete`` -- How much of the transition is complete, as a
+      number greater than or equal to ``0`` and less than ``1``.
+    - ``arg`` -- The ``transition_arg`` argument passed to
+      :meth:`sge.dsp.Room.start`.
+
+    ``sprite`` is drawn onto the window as it is, without being copied
+    or converted, so drawing on it is just as fast as drawing on the
+    window itself.  Its size and transparency should not be changed.
+    """
+    r.game_transitions[name] = functools.partial(r_update_custom, update)
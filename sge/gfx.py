@@ -18,6 +18,7 @@ This module provides classes related to rendering graphics.
 """
 
 
+import json
 import math
 import os
 import warnings
@@ -28,9 +29,16 @@ import pygame
 import sge
 from sge import r
 from sge.r import (_check_color_input, _check_color, _scale, _get_blend_flags,
-                   _screen_blend, _apply_shader, f_split_text, s_get_image,
-                   s_set_size, s_refresh, s_set_transparency, s_from_text,
-                   tg_blit)
+                   _screen_blend, _apply_shader, _apply_array_shader,
+                   _load_image, _discard_preloads, LazyFrames, f_load,
+                   f_split_text, f_get_size, f_render_line, s_get_image,
+                   s_set_size, s_refresh, s_edit_frame, s_set_transparency,
+                   s_get_pixel_view, s_get_pixel_copy, s_remap_colors,
+                   s_from_text, s_bake, s_check_alpha, s_find_files,
+                   s_get_strip_length, s_get_index, s_get_index_key,
+                   s_clear_index, s_load_atlas, s_pack_atlas, s_get_asset_key,
+                   s_read_asset_images, s_write_asset_images, TileList,
+                   tg_blit, tg_mark_dirty)
 
 COLORS = {'white': '#ffffff', 'silver': '#c0c0c0', 'gray': '#808080',
           'black': '#000000', 'red': '#ff0000', 'maroon': '#800000',
@@ -44,7 +52,8 @@ for pair in COLORS.items():
 
 
 __all__ = ["Color", "Sprite", "TileGrid", "Font", "BackgroundLayer",
-           "Background"]
+           "Background", "get_sprite_index", "set_sprite_index",
+           "clear_sprite_index", "save_atlas"]
 
 
 class Color:
@@ -332,6 +341,31 @@ class Sprite:
        will become equal to ``height - bbox_y`` (which is always
        everything on the image below :attr:`bbox_y`).
 
+    .. attribute:: rotation_step
+
+       If set to a number other than :const:`None`, all rotations the
+       sprite is drawn at are rounded to the nearest multiple of this
+       value in degrees.  For example, if this is ``5``, a sprite
+       rotated by ``43.7`` degrees will be drawn rotated by ``45``
+       degrees.  This allows transformed images to be reused when
+       rotation changes gradually, at the cost of precision.
+
+       See also :meth:`sge.gfx.Sprite.bake_transforms`.
+
+    .. attribute:: scale_step
+
+       If set to a number other than :const:`None`, all horizontal and
+       vertical scale factors the sprite is drawn at are rounded to the
+       nearest multiple of this value, the same way as
+       :attr:`rotation_step` rounds rotations.
+
+    .. attribute:: alpha_step
+
+       If set to a number other than :const:`None`, all alpha
+       transparency values the sprite is drawn at are rounded to the
+       nearest multiple of this value, the same way as
+       :attr:`rotation_step` rounds rotations.
+
     .. attribute:: name
 
        The name of the sprite given when it was created.  (Read-only)
@@ -448,7 +482,9 @@ class Sprite:
 
     def __init__(self, name=None, directory="", *, width=None, height=None,
                  transparent=True, origin_x=0, origin_y=0, fps=60, bbox_x=None,
-                 bbox_y=None, bbox_width=None, bbox_height=None):
+                 bbox_y=None, bbox_width=None, bbox_height=None,
+                 rotation_step=None, scale_step=None, alpha_step=None,
+                 frame_cache=None, frame_prefetch=0):
         """
         Parameters:
 
@@ -479,100 +515,117 @@ class Sprite:
           :exc:`FileNotFoundError` is raised.
 
         - ``directory`` -- The directory to search for image files in.
+          The directory is only scanned the first time a sprite is
+          loaded from it; see :func:`sge.gfx.get_sprite_index`.
+        - ``frame_cache`` -- If set to an integer, the frames of the
+          sprite are not loaded right away, but each frame is loaded
+          the first time it is used, and at most this many loaded
+          frames (but at least 2) are kept in memory at once.  This
+          can save a lot of memory for sprites with many large frames,
+          such as full-screen animations, at the cost of loading frames
+          again whenever they are used after being discarded.  If set
+          to :const:`None`, all frames are loaded right away.
+        - ``frame_prefetch`` -- If ``frame_cache`` is set, how many of
+          the frames after each frame used should be loaded ahead of
+          time in the background, so that they are ready when they are
+          used during an animation.
 
         All other arguments set the respective initial attributes of the
         sprite.  See the documentation for :class:`Sprite` for more
         information.
+
+        .. note::
+
+           If ``frame_cache`` is set, frames which are drawn on or
+           otherwise changed in place are kept in memory from then on
+           so that the change is not lost.  Adding, removing, or
+           reordering frames causes all frames to be loaded and kept.
+           All frames are assumed to be the same size as the first
+           frame, and errors in image files are only detected when the
+           frames are used.
         """
         self.rd = {}
         self.name = name
         self.rd["baseimages"] = []
         self.rd["drawcycle"] = 0
+        self.rd["baked"] = {}
+        self.rd["baked_drawcycle"] = 0
+        self.rd["converted"] = {}
 
-        fname_single = []
-        fname_frames = []
-        fname_strip = []
         errlist = []
+        asset_key = None
+        asset_found = False
 
         if name is not None:
-            def check_alpha(surface):
-                # Check whether the surface has a colorkey.  If it does,
-                # return the surface converted to use alpha
-                # transparency.  Otherwise, return the surface.
-                if surface.get_colorkey() is not None:
-                    return surface.convert_alpha()
-
-                return surface
-
             if not directory:
                 directory = os.curdir
-            for fname in os.listdir(directory):
-                full_fname = os.path.join(directory, fname)
-                if (fname.startswith(name) and
-                        os.path.isfile(full_fname)):
-                    root, ext = os.path.splitext(fname)
-                    if root == name:
-                        split = [name, '']
-                    elif root.rsplit('-', 1)[0] == name:
-                        split = root.rsplit('-', 1)
-                    elif root.rsplit('_', 1)[0] == name:
-                        split = root.rsplit('_', 1)
-                    else:
-                        continue
-
-                    if root == name:
-                        fname_single.append(full_fname)
-                    elif split[1].isdigit():
-                        n = int(split[1])
-                        while len(fname_frames) - 1 < n:
-                            fname_frames.append(None)
-                        fname_frames[n] = full_fname
-                    elif (split[1].startswith('strip') and
-                          split[1][5:].isdigit()):
-                        fname_strip.append(full_fname)
-
-            if any(fname_single):
+            fname_single, fname_frames, fname_strip = s_find_files(
+                name, directory)
+
+            if frame_cache is None and r._asset_cache_dir is not None:
+                fnames = (fname_single + [f for f in fname_frames if f] +
+                          fname_strip)
+                asset_key = s_get_asset_key(fnames, width, height,
+                                            sge.game.scale_method)
+                self.rd["baseimages"] = s_read_asset_images(asset_key)
+                asset_found = bool(self.rd["baseimages"])
+
+            if frame_cache is not None:
+                if any(fname_single):
+                    sources = [(fname, 0, 1) for fname in fname_single]
+                elif any(fname_frames):
+                    sources = [(fname, 0, 1) for fname in fname_frames
+                               if fname]
+                else:
+                    sources = []
+                    for fname in fname_strip:
+                        n = s_get_strip_length(name, fname)
+                        sources.extend((fname, part, n) for part in range(n))
+
+                if sources:
+                    self.rd["baseimages"] = LazyFrames(
+                        self.rd, sources, frame_cache, frame_prefetch)
+                    first = self.rd["baseimages"][0]
+                    if width is None:
+                        width = first.get_width()
+                    if height is None:
+                        height = first.get_height()
+            elif asset_found:
+                _discard_preloads(fnames)
+            elif any(fname_single):
                 # Load the single image
                 for fname in fname_single:
                     try:
-                        img = pygame.image.load(fname)
+                        img = _load_image(fname)
                     except pygame.error as e:
                         errlist.append(e)
                     else:
-                        self.rd["baseimages"].append(check_alpha(img))
+                        self.rd["baseimages"].append(s_check_alpha(img))
 
             if not self.rd["baseimages"] and any(fname_frames):
                 # Load the multiple images
                 for fname in fname_frames:
                     if fname:
                         try:
-                            img = pygame.image.load(fname)
+                            img = _load_image(fname)
                         except pygame.error as e:
                             errlist.append(e)
                         else:
-                            self.rd["baseimages"].append(check_alpha(img))
+                            self.rd["baseimages"].append(s_check_alpha(img))
 
             if not self.rd["baseimages"] and any(fname_strip):
                 # Load the strip (sprite sheet)
                 for fname in fname_strip:
-                    root, ext = os.path.splitext(os.path.basename(fname))
-                    assert '-' in root or '_' in root
-                    assert (root.rsplit('-', 1)[0] == name or
-                            root.rsplit('_', 1)[0] == name)
-                    if root.rsplit('-', 1)[0] == name:
-                        split = root.rsplit('-', 1)
-                    else:
-                        split = root.rsplit('_', 1)
+                    n = s_get_strip_length(name, fname)
+                    assert n is not None
 
                     try:
-                        sheet = pygame.image.load(fname)
+                        sheet = _load_image(fname)
                     except pygame.error as e:
                         errlist.append(e)
                     else:
-                        sheet = check_alpha(sheet)
+                        sheet = s_check_alpha(sheet)
                         flags = sheet.get_flags()
-                        assert split[1][5:].isdigit()
-                        n = int(split[1][5:])
 
                         img_w = max(1, sheet.get_width()) // n
                         img_h = max(1, sheet.get_height())
@@ -621,7 +674,12 @@ class Sprite:
 
         self.__w = round(width)
         self.__h = round(height)
-        s_set_size(self)
+        if not asset_found:
+            # Images from the asset cache are already scaled.
+            s_set_size(self)
+            if asset_key is not None:
+                s_write_asset_images(asset_key, self.rd["baseimages"])
+
         self.origin_x = origin_x
         self.origin_y = origin_y
         self.__transparent = transparent
@@ -630,8 +688,13 @@ class Sprite:
         self.bbox_y = bbox_y
         self.bbox_width = bbox_width
         self.bbox_height = bbox_height
+        self.rotation_step = rotation_step
+        self.scale_step = scale_step
+        self.alpha_step = alpha_step
         self.rd["locked"] = False
         s_refresh(self)
+        if asset_key is not None:
+            self.rd["asset"] = (asset_key, self.rd["drawcycle"])
 
     def append_frame(self):
         """Append a new blank frame to the end of the sprite."""
@@ -715,14 +778,131 @@ class Sprite:
           the first frame.
         """
         frame %= self.frames
+        if r.USE_NUMPY:
+            return [[Color(tuple(pixel)) for pixel in column]
+                    for column in self.get_pixel_array(frame).tolist()]
+
         surf = self.rd["baseimages"][frame]
         surf.lock()
         w, h = surf.get_size()
-        pixels = [[Color(tuple(surf.get_at(x, y))) for y in range(h)]
+        pixels = [[Color(tuple(surf.get_at((x, y)))) for y in range(h)]
                   for x in range(w)]
         surf.unlock()
         return pixels
 
+    def get_pixel_array(self, frame=0, *, writable=False):
+        """
+        Return a NumPy array of the colors of a particular frame's
+        pixels.
+
+        The array has a shape of ``(width, height, 4)`` and a data type
+        of ``numpy.uint8``.  A returned array given the name ``pixels``
+        is indexed as ``pixels[x, y]``, which is itself an array of the
+        red, green, blue, and alpha values of the pixel, in that order.
+        This is much faster than :meth:`get_pixels` and allows the
+        pixels to be processed with NumPy's array operations.
+
+        Parameters:
+
+        - ``frame`` -- The frame of the sprite to get the pixels of,
+          where ``0`` is the first frame.
+        - ``writable`` -- If set to :const:`False`, the returned array
+          is a copy of the pixels, and changing it has no effect on the
+          sprite.  If set to :const:`True`, the returned array refers to
+          the sprite's pixels directly, and changing it changes the
+          sprite.  This is the fastest way to modify a sprite, but the
+          sprite must be locked with :meth:`draw_lock` first, and the
+          frame is converted to a 32-bit format with per-pixel alpha if
+          it isn't one already.
+
+        .. warning::
+
+           While a writable array exists, the frame it refers to is
+           locked and cannot be used in any other way, not even by
+           other drawing methods.  Delete all references to a writable
+           array (e.g. with ``del``) before calling :meth:`draw_unlock`,
+           which is required for the changes to be shown.
+
+        .. note::
+
+           This method requires NumPy.  If NumPy is not installed,
+           :exc:`ImportError` is raised.
+
+        See also: :meth:`sge.gfx.Sprite.set_pixel_array`
+        """
+        if not r.USE_NUMPY:
+            raise ImportError("NumPy is required to use pixel arrays.")
+        if writable and not self.rd["locked"]:
+            e = "Sprite must be locked with draw_lock to get a writable array."
+            raise ValueError(e)
+
+        frame %= self.frames
+        if writable:
+            return s_get_pixel_view(self, frame)
+        return s_get_pixel_copy(self, frame)
+
+    def set_pixel_array(self, pixels, x=0, y=0, frame=None):
+        """
+        Replace a rectangular area of pixels on the sprite with the
+        colors in an array.
+
+        Parameters:
+
+        - ``pixels`` -- A NumPy array, or anything which can be
+          converted into one, with a shape of ``(width, height, 4)``,
+          indexed the same way as arrays returned by
+          :meth:`get_pixel_array`.  It can also have a shape of
+          ``(width, height, 3)``, in which case alpha values are left
+          unchanged.  Values are clipped to the range of ``0`` to
+          ``255``.
+        - ``x`` -- The horizontal location relative to the sprite to
+          place the left edge of the area.
+        - ``y`` -- The vertical location relative to the sprite to
+          place the top edge of the area.
+        - ``frame`` -- The frame of the sprite to set the pixels of,
+          where ``0`` is the first frame; set to ``None`` to set the
+          pixels of all frames.
+
+        Parts of the area outside of the sprite are ignored.  Pixels
+        are replaced rather than blended with the existing pixels.
+
+        .. note::
+
+           This method requires NumPy.  If NumPy is not installed,
+           :exc:`ImportError` is raised.
+        """
+        if not r.USE_NUMPY:
+            raise ImportError("NumPy is required to use pixel arrays.")
+
+        x = round(x)
+        y = round(y)
+        pixels = r.numpy.asarray(pixels)
+        if pixels.ndim != 3 or pixels.shape[2] not in {3, 4}:
+            e = ("Pixel array must have a shape of (width, height, 4) or "
+                 "(width, height, 3).")
+            raise ValueError(e)
+
+        x1 = max(0, x)
+        y1 = max(0, y)
+        x2 = min(self.width, x + pixels.shape[0])
+        y2 = min(self.height, y + pixels.shape[1])
+        if x1 >= x2 or y1 >= y2:
+            return
+
+        pixels = r.numpy.clip(pixels[x1 - x:x2 - x, y1 - y:y2 - y], 0, 255)
+
+        if frame is None:
+            rng = range(self.frames)
+        else:
+            rng = [frame % self.frames]
+
+        for i in rng:
+            view = s_get_pixel_view(self, i)
+            view[x1:x2, y1:y2, :pixels.shape[2]] = pixels
+            del view
+
+        s_refresh(self)
+
     def draw_dot(self, x, y, color, frame=None, *, blend_mode=None):
         """
         Draw a single-pixel dot on the sprite.
@@ -771,12 +951,12 @@ class Sprite:
 
         if color.alpha == 255 and not pygame_flags:
             for i in rng:
-                self.rd["baseimages"][i].set_at((x, y), pg_color)
+                s_edit_frame(self, i).set_at((x, y), pg_color)
         else:
             stamp = pygame.Surface((1, 1), pygame.SRCALPHA)
             stamp.fill(pg_color)
             for i in rng:
-                dsurf = self.rd["baseimages"][i]
+                dsurf = s_edit_frame(self, i)
                 if blend_mode == sge.BLEND_RGB_SCREEN:
                     _screen_blend(dsurf, stamp, x, y, False)
                 elif blend_mode == sge.BLEND_RGBA_SCREEN:
@@ -873,7 +1053,7 @@ class Sprite:
                     stamp = pygame.transform.scale(stamp, size)
 
         for i in rng:
-            dsurf = self.rd["baseimages"][i]
+            dsurf = s_edit_frame(self, i)
             if blend_mode == sge.BLEND_RGB_SCREEN:
                 _screen_blend(dsurf, stamp, 0, 0, False)
             elif blend_mode == sge.BLEND_RGBA_SCREEN:
@@ -964,7 +1144,7 @@ class Sprite:
             pygame.draw.rect(stamp, pg_outl, rect, outline_thickness)
 
         for i in rng:
-            dsurf = self.rd["baseimages"][i]
+            dsurf = s_edit_frame(self, i)
             if blend_mode == sge.BLEND_RGB_SCREEN:
                 _screen_blend(dsurf, stamp, 0, 0, False)
             elif blend_mode == sge.BLEND_RGBA_SCREEN:
@@ -1074,7 +1254,7 @@ class Sprite:
                 stamp = pygame.transform.scale(stamp, size)
 
         for i in rng:
-            dsurf = self.rd["baseimages"][i]
+            dsurf = s_edit_frame(self, i)
             if blend_mode == sge.BLEND_RGB_SCREEN:
                 _screen_blend(dsurf, stamp, 0, 0, False)
             elif blend_mode == sge.BLEND_RGBA_SCREEN:
@@ -1181,7 +1361,7 @@ class Sprite:
                 stamp = pygame.transform.scale(stamp, size)
 
         for i in rng:
-            dsurf = self.rd["baseimages"][i]
+            dsurf = s_edit_frame(self, i)
             if blend_mode == sge.BLEND_RGB_SCREEN:
                 _screen_blend(dsurf, stamp, 0, 0, False)
             elif blend_mode == sge.BLEND_RGBA_SCREEN:
@@ -1267,7 +1447,7 @@ class Sprite:
                 pygame.draw.lines(stamp, pg_color, False, points, thickness)
 
         for i in rng:
-            dsurf = self.rd["baseimages"][i]
+            dsurf = s_edit_frame(self, i)
             if blend_mode == sge.BLEND_RGB_SCREEN:
                 _screen_blend(dsurf, stamp, 0, 0, False)
             elif blend_mode == sge.BLEND_RGBA_SCREEN:
@@ -1375,7 +1555,7 @@ class Sprite:
                     stamp = pygame.transform.scale(stamp, size)
 
         for i in rng:
-            dsurf = self.rd["baseimages"][i]
+            dsurf = s_edit_frame(self, i)
             if blend_mode == sge.BLEND_RGB_SCREEN:
                 _screen_blend(dsurf, stamp, 0, 0, False)
             elif blend_mode == sge.BLEND_RGBA_SCREEN:
@@ -1433,7 +1613,7 @@ class Sprite:
             rng = [frame % self.frames]
 
         for i in rng:
-            dsurf = self.rd["baseimages"][i]
+            dsurf = s_edit_frame(self, i)
             if isinstance(sprite, sge.gfx.Sprite):
                 ssurf = s_set_transparency(sprite,
                                            sprite.rd["baseimages"][image])
@@ -1548,9 +1728,13 @@ class Sprite:
         outline_thickness = abs(round(outline_thickness))
 
         lines = f_split_text(font, text, width)
-        width = int(font.get_width(text, width, height)) + 2*outline_thickness
-        height = int(font.get_height(text, width, height)) + 2*outline_thickness
-        fake_height = int(font.get_height(text, width)) + 2*outline_thickness
+        text_width, fake_height = f_get_size(font, lines, width)
+        width = int(text_width) + 2*outline_thickness
+        fake_height = int(fake_height) + 2*outline_thickness
+        if height is not None:
+            height = min(fake_height, int(height) + 2*outline_thickness)
+        else:
+            height = fake_height
 
         text_surf = pygame.Surface((width, fake_height), pygame.SRCALPHA)
         box_surf = pygame.Surface((width, height), pygame.SRCALPHA)
@@ -1559,61 +1743,9 @@ class Sprite:
 
         pygame_flags = _get_blend_flags(blend_mode)
 
-        if outline is not None and outline_thickness:
-            # We do a separate loop here so that if it overlaps itself,
-            # the outline won't cover up real text.
-            for i, line in enumerate(lines):
-                ol_part = font.rd["font"].render(line, anti_alias,
-                                                 pygame.Color(*outline))
-
-                part_rect = ol_part.get_rect()
-                part_rect.top += outline_thickness
-                if halign == "left":
-                    part_rect.left = text_rect.left + outline_thickness
-                elif halign == "right":
-                    part_rect.right = text_rect.right - outline_thickness
-                elif halign == "center":
-                    part_rect.centerx = text_rect.centerx
-
-                rendered_outline = pygame.Surface(text_rect.size,
-                                                  pygame.SRCALPHA)
-
-                rect = rendered_outline.get_rect()
-                rect.top = i*font.rd["font"].get_linesize()
-                if halign == "left":
-                    rect.left = text_rect.left
-                elif halign == "right":
-                    rect.right = text_rect.right
-                elif halign == "center":
-                    rect.centerx = text_rect.centerx
-
-                ol_range = range(-outline_thickness, outline_thickness + 1)
-                for xx in ol_range:
-                    for yy in ol_range:
-                        # We exclude positions where the distance from
-                        # the real text is greater than the outline
-                        # thickness to create a round outline rather
-                        # than a square one (a^2 + b^2 = c^2).
-                        if math.sqrt(xx**2 + yy**2) <= outline_thickness:
-                            brect = part_rect.copy()
-                            brect.left += xx
-                            brect.top += yy
-                            rendered_outline.blit(ol_part, brect)
-
-                if outline.alpha < 255:
-                    rendered_outline = rendered_outline.convert_alpha()
-                    rendered_outline.fill((0, 0, 0, 255 - outline.alpha), None,
-                                          pygame.BLEND_RGBA_SUB)
-
-                text_surf.blit(rendered_outline, rect)
-
+        line_rects = []
         for i, line in enumerate(lines):
-            rendered_text = font.rd["font"].render(line, anti_alias,
-                                                   pygame.Color(*color))
-            if color.alpha < 255:
-                rendered_text = rendered_text.convert_alpha()
-                rendered_text.fill((0, 0, 0, 255 - color.alpha), None,
-                                   pygame.BLEND_RGBA_SUB)
+            rendered_text = f_render_line(font, line, anti_alias, color)
             rect = rendered_text.get_rect()
             rect.top = i*font.rd["font"].get_linesize() + outline_thickness
             if halign == "left":
@@ -1622,7 +1754,19 @@ class Sprite:
                 rect.right = text_rect.right - outline_thickness
             elif halign == "center":
                 rect.centerx = text_rect.centerx
+            line_rects.append((rendered_text, rect))
 
+        if outline is not None and outline_thickness:
+            # We do a separate loop here so that if it overlaps itself,
+            # the outline won't cover up real text.
+            for line, (rendered_text, rect) in zip(lines, line_rects):
+                rendered_outline = f_render_line(font, line, anti_alias,
+                                                 outline, outline_thickness)
+                text_surf.blit(rendered_outline,
+                               (rect.left - outline_thickness,
+                                rect.top - outline_thickness))
+
+        for rendered_text, rect in line_rects:
             text_surf.blit(rendered_text, rect)
 
         if valign == "top":
@@ -1658,7 +1802,7 @@ class Sprite:
             rng = [frame % self.frames]
 
         for i in rng:
-            dsurf = self.rd["baseimages"][i]
+            dsurf = s_edit_frame(self, i)
             if blend_mode == sge.BLEND_RGB_SCREEN:
                 _screen_blend(dsurf, box_surf, box_rect.left, box_rect.top,
                               False)
@@ -1670,7 +1814,8 @@ class Sprite:
 
         s_refresh(self)
 
-    def draw_shader(self, x, y, width, height, shader, frame=None):
+    def draw_shader(self, x, y, width, height, shader, frame=None, *,
+                    array=False):
         """
         Apply a pixel shader to the sprite.
 
@@ -1686,6 +1831,8 @@ class Sprite:
         - ``frame`` -- The frame of the sprite to apply the shader to,
           where ``0`` is the first frame; set to ``None`` to erase from
           all frames.
+        - ``array`` -- Whether or not the shader is an array shader
+          (see below).
 
         The ``shader`` argument is a callback function which must
         contain the following Parameters:
@@ -1717,24 +1864,54 @@ class Sprite:
             def shader(x, y, red, green, blue, alpha):
                 return (255 - red, 255 - green, 255 - blue, alpha)
 
+        If ``array`` is :const:`True`, the shader is instead called only
+        once for each frame, and each of its arguments is a NumPy array
+        containing the respective value for every pixel in the area,
+        indexed as ``[x, y]``.  It must then return arrays (or single
+        numbers) of the new ``red``, ``green``, ``blue``, and ``alpha``
+        values in the same way.  Resulting values are clipped to the
+        range of ``0`` to ``255``.  This allows the shader to process
+        the whole area at once with NumPy's array operations, which is
+        many times faster.  Note that the example shader above works
+        as an array shader as well.
+
         .. note::
 
            Due to use of the CPU, applying these shaders is highly
-           inefficient. To compensate, it is important to apply shaders
-           to sprites as infrequently as possible, preferably just once
-           at the start, and reuse the sprites they were applied to.
+           inefficient, particularly shaders which are not array
+           shaders.  To compensate, it is important to apply shaders to
+           sprites as infrequently as possible, preferably just once at
+           the start, and reuse the sprites they were applied to.
+
+        .. note::
+
+           Array shaders require NumPy.  If NumPy is not installed, a
+           warning is issued and the shader is called for each pixel
+           instead, the same way as if ``array`` were :const:`False`.
         """
         if frame is None:
             rng = range(self.frames)
         else:
             rng = [frame % self.frames]
 
+        if array and not r.USE_NUMPY:
+            w = "NumPy is not installed; calling array shader for each pixel."
+            warnings.warn(w)
+            array = False
+
         for i in rng:
-            img = self.rd["baseimages"][i]
+            img = s_edit_frame(self, i)
             img.lock()
-            _apply_shader(img, int(x), int(y), int(width), int(height), shader)
+            if array and img.get_bitsize() in {24, 32}:
+                _apply_array_shader(img, int(x), int(y), int(width),
+                                    int(height), shader)
+            else:
+                _apply_shader(img, int(x), int(y), int(width), int(height),
+                              shader)
             img.unlock()
 
+        s_refresh(self)
+
     def draw_erase(self, x, y, width, height, frame=None):
         """
         Erase part of the sprite.
@@ -1757,13 +1934,14 @@ class Sprite:
             rng = [frame % self.frames]
 
         for i in rng:
-            if self.rd["baseimages"][i].get_flags() & pygame.SRCALPHA:
+            img = s_edit_frame(self, i)
+            if img.get_flags() & pygame.SRCALPHA:
                 color = pygame.Color(0, 0, 0, 0)
             else:
-                color = self.rd["baseimages"][i].get_colorkey()
+                color = img.get_colorkey()
 
             rect = pygame.Rect(x, y, width, height)
-            self.rd["baseimages"][i].fill(color, rect)
+            img.fill(color, rect)
 
         s_refresh(self)
 
@@ -1988,8 +2166,9 @@ class Sprite:
             else:
                 x = -(new_w - self.__w) / 2
                 y = -(new_h - self.__h) / 2
-                self.rd["baseimages"][i].fill(pygame.Color(0, 0, 0, 0))
-                self.rd["baseimages"][i].blit(img, (int(x), int(y)))
+                dsurf = s_edit_frame(self, i)
+                dsurf.fill(pygame.Color(0, 0, 0, 0))
+                dsurf.blit(img, (int(x), int(y)))
 
         if adaptive_resize:
             xdiff = (new_w - self.__w) / 2
@@ -2028,33 +2207,66 @@ class Sprite:
         .. note::
 
            If you have to swap multiple colors, use of
-           :meth:`Sprite.draw_shader` will probably be more efficient.
+           :meth:`Sprite.remap_colors` will be more efficient.
         """
         _check_color(old_color)
         _check_color(new_color)
         if old_color is None or new_color is None:
             return
 
+        self.remap_colors([(old_color, new_color)], frame)
+
+    def remap_colors(self, colors, frame=None):
+        """
+        Change all pixels of several colors to other colors at once.
+
+        Parameters:
+
+        - ``colors`` -- A list of ``(old_color, new_color)`` tuples,
+          where ``old_color`` is a :class:`sge.gfx.Color` object
+          indicating the color of pixels to change and ``new_color`` is
+          a :class:`sge.gfx.Color` object indicating the color to change
+          those pixels to.
+        - ``frame`` -- The frame of the sprite to modify, where ``0`` is
+          the first frame; set to ``None`` to modify all frames.
+
+        All colors are changed at the same time, so a pixel is never
+        changed twice.  For example, this would swap all red pixels
+        with all blue pixels::
+
+            sprite.remap_colors([(sge.gfx.Color("red"),
+                                  sge.gfx.Color("blue")),
+                                 (sge.gfx.Color("blue"),
+                                  sge.gfx.Color("red"))])
+
+        This is much faster than calling :meth:`swap_color` once for
+        each color, particularly if NumPy is installed.  If a frame is
+        an indexed (palette-based) image and none of the new colors are
+        partially transparent, only the palette is changed, which is
+        faster still.
+
+        If the same old color is listed more than once, only the last
+        instance is used.
+        """
+        remap = {}
+        for old_color, new_color in colors:
+            _check_color(old_color)
+            _check_color(new_color)
+            if old_color is not None and new_color is not None:
+                remap[tuple(old_color)] = tuple(new_color)
+
+        if not remap:
+            return
+
         if frame is None:
             rng = range(self.frames)
         else:
             rng = [frame % self.frames]
 
-        new_color_t = tuple(new_color)
-
         for i in rng:
-            img = self.rd["baseimages"][i]
-            img.lock()
-            pixarray = pygame.PixelArray(img)
-            for x in range(img.get_width()):
-                for y in range(img.get_height()):
-                    red, green, blue, alpha = img.unmap_rgb(pixarray[x, y])
-                    if (red == old_color.red and green == old_color.green
-                            and blue == old_color.blue
-                            and alpha == old_color.alpha):
-                        pixarray[x, y] = img.map_rgb(new_color_t)
-            pixarray.close()
-            img.unlock()
+            s_remap_colors(self, i, remap)
+
+        s_refresh(self)
 
     def copy(self):
         """Return a copy of the sprite."""
@@ -2062,7 +2274,8 @@ class Sprite:
             width=self.width, height=self.height, transparent=self.transparent,
             origin_x=self.origin_x, origin_y=self.origin_y, fps=self.fps,
             bbox_x=self.bbox_x, bbox_y=self.bbox_y, bbox_width=self.bbox_width,
-            bbox_height=self.bbox_height)
+            bbox_height=self.bbox_height, rotation_step=self.rotation_step,
+            scale_step=self.scale_step, alpha_step=self.alpha_step)
         for i in range(1, self.frames):
             new_copy.append_frame()
         for i in range(self.frames):
@@ -2070,6 +2283,64 @@ class Sprite:
 
         return new_copy
 
+    def bake_transforms(self, rotations=None, xscales=(1,), yscales=(1,),
+                        alphas=(255,)):
+        """
+        Generate transformed versions of the sprite in advance.
+
+        Normally, the SGE generates each scaled, rotated, or partially
+        transparent version of a sprite the first time it is drawn that
+        way, which can cause stutter when many new transformations are
+        needed at once.  This method generates every combination of the
+        given transformations for every frame ahead of time, so that
+        drawing the sprite with any of them later is instant.  Baked
+        images are also never discarded from memory the way cached
+        images are.
+
+        Parameters:
+
+        - ``rotations`` -- An iterable of rotations in degrees to
+          generate.  If set to :const:`None`, every multiple of
+          :attr:`rotation_step` from 0 to 360 is used if
+          :attr:`rotation_step` is set, and only no rotation is used
+          otherwise.
+        - ``xscales`` -- An iterable of horizontal scale factors to
+          generate.  Negative values generate mirrored images.
+        - ``yscales`` -- An iterable of vertical scale factors to
+          generate.  Negative values generate flipped images.
+        - ``alphas`` -- An iterable of alpha transparency values to
+          generate.
+
+        All values are rounded according to :attr:`rotation_step`,
+        :attr:`scale_step`, and :attr:`alpha_step` the same way they
+        are when the sprite is drawn, so this method is most effective
+        when used together with these attributes.  Calling this method
+        again replaces all previously baked images.
+
+        .. note::
+
+           Baked images are discarded when the sprite is changed in any
+           way, such as by drawing on it.  Because of this, you should
+           call this method only after you are done modifying the
+           sprite.
+
+        .. note::
+
+           Each combination uses about as much memory as the sprite
+           itself, more for larger scale factors, so be careful not to
+           bake more variants than you need.  Blended images are not
+           baked.
+        """
+        if rotations is None:
+            if self.rotation_step:
+                rotations = [i * self.rotation_step for i in
+                             range(math.ceil(360 / self.rotation_step))]
+            else:
+                rotations = [0]
+
+        s_bake(self, list(rotations), list(xscales), list(yscales),
+               list(alphas))
+
     def get_spritelist(self):
         """
         Return a list of sprites based on this one.
@@ -2085,7 +2356,8 @@ class Sprite:
                 transparent=self.transparent, origin_x=self.origin_x,
                 origin_y=self.origin_y, fps=self.fps, bbox_x=self.bbox_x,
                 bbox_y=self.bbox_y, bbox_width=self.bbox_width,
-                bbox_height=self.bbox_height)
+                bbox_height=self.bbox_height, rotation_step=self.rotation_step,
+                scale_step=self.scale_step, alpha_step=self.alpha_step)
             frame_sprite.draw_sprite(self, i, self.origin_x, self.origin_y)
             spritelist.append(frame_sprite)
 
@@ -2122,6 +2394,10 @@ class Sprite:
                 os.path.normpath(os.path.realpath(fname)))
             raise OSError(m)
 
+        # Make sure the new file can be found if the directory was
+        # indexed before.
+        s_clear_index(os.path.dirname(fname))
+
     @classmethod
     def from_tween(cls, sprite, frames, fps=None, *, xscale=None, yscale=None,
                    rotation=None, blend=None, bbox_x=None, bbox_y=None,
@@ -2328,10 +2604,11 @@ class Sprite:
                    bbox_height=bbox_height)
 
         try:
-            tileset = pygame.image.load(fname)
+            tileset = _load_image(fname)
         except pygame.error as e:
             raise OSError(e)
 
+        tileset = s_set_transparency(self, tileset)
         for i in range(1, rows * columns):
             self.append_frame()
 
@@ -2340,9 +2617,59 @@ class Sprite:
                 frame = i * columns + j
                 x_ = x + (width + xsep) * j
                 y_ = y + (height + ysep) * i
-                self.rd["baseimages"][frame].blit(
-                    s_set_transparency(self, tileset), (int(-x_), int(-y_)))
+                self.rd["baseimages"][frame].blit(tileset,
+                                                  (int(-x_), int(-y_)))
+
+        s_refresh(self)
+        return self
+
+    @classmethod
+    def from_atlas(cls, fname, name):
+        """
+        Return a sprite from a sprite atlas.
+
+        A sprite atlas is a single image containing the frames of any
+        number of sprites, along with a JSON file listing where each
+        sprite's frames are in the image and the sprite's attributes.
+        Atlases can be created with :func:`sge.gfx.save_atlas`.
+        Loading many small sprites from an atlas is much faster than
+        loading each of them from its own files.
+
+        Parameters:
 
+        - ``fname`` -- The path to the JSON file of the atlas.
+        - ``name`` -- The name of the sprite in the atlas.  If the atlas
+          has no sprite with this name, :exc:`ValueError` is raised.
+
+        The image of an atlas is only loaded once, and the frames of
+        sprites loaded from it refer directly to parts of it.  Because
+        of this, drawing on such a sprite also changes any other sprite
+        loaded with the same name from the same atlas; use
+        :meth:`copy` to get a sprite which can be changed
+        independently.
+        """
+        index, atlas = s_load_atlas(fname)
+        info = index["sprites"].get(name)
+        if info is None:
+            e = 'Sprite "{}" not found in atlas "{}".'.format(name, fname)
+            raise ValueError(e)
+
+        transparent = info.get("transparent", True)
+        if isinstance(transparent, list):
+            transparent = Color(transparent)
+
+        width = info["width"]
+        height = info["height"]
+        self = cls(width=width, height=height,
+                   origin_x=info.get("origin_x", 0),
+                   origin_y=info.get("origin_y", 0), transparent=transparent,
+                   fps=info.get("fps", 60), bbox_x=info.get("bbox_x"),
+                   bbox_y=info.get("bbox_y"),
+                   bbox_width=info.get("bbox_width"),
+                   bbox_height=info.get("bbox_height"))
+        self.name = name
+        self.rd["baseimages"] = [atlas.subsurface((x, y, width, height))
+                                 for x, y in info["frames"]]
         s_refresh(self)
         return self
 
@@ -2425,6 +2752,11 @@ class TileGrid:
        :attr:`render_method` and :attr:`section_length`.  Use ``None``
        where no tile should be displayed.
 
+       A list assigned to this attribute is copied into a list which
+       keeps track of which tiles change (see :attr:`chunk_size`), so
+       later changes to the original list have no effect on the grid.
+       Grids made with :meth:`copy` share the same list.
+
     .. attribute:: render_method
 
        A string indicating how the tiles should be rendered.  Can be one
@@ -2509,6 +2841,24 @@ class TileGrid:
           result of this, particularly any portion of a sprite outside
           of its designated area, is undefined.
 
+    .. attribute:: chunk_size
+
+       If set to a number other than :const:`None`, the grid is divided
+       into square chunks of this many tiles on each side, and each
+       chunk is rendered to a single image the first time it is drawn.
+       After that, the whole chunk is drawn at once, which is much
+       faster than drawing each tile individually.  A chunk is only
+       rendered again after any of its tiles change.  If tiles are
+       replaced, whether with :meth:`set_tile`, :meth:`fill_tiles`,
+       :meth:`replace_tiles`, or by assigning to items of
+       :attr:`tiles`, only the changed tiles are redrawn.  Adding,
+       removing, or reordering tiles, or assigning a new list to
+       :attr:`tiles`, renders all chunks again.
+
+       Chunks are only used if :attr:`render_method` is
+       ``"orthogonal"``.  The memory they use is limited by the
+       ``"tiles"`` budget set by :func:`sge.dsp.set_cache_budget`.
+
     .. attribute:: width
 
        The total width of the tile grid in pixels.  Attempting to change
@@ -2645,6 +2995,20 @@ class TileGrid:
         else:
             self.__bbox_width = self.width - self.bbox_y
 
+    @property
+    def tiles(self):
+        return self.__tiles
+
+    @tiles.setter
+    def tiles(self, value):
+        if not isinstance(value, TileList):
+            value = TileList(value)
+        if self.__tiles is not None:
+            self.__tiles.grids.discard(self)
+        value.grids.add(self)
+        self.__tiles = value
+        tg_mark_dirty(self)
+
     @property
     def bbox_height(self):
         return self.__bbox_height
@@ -2659,13 +3023,14 @@ class TileGrid:
     def __init__(self, tiles, render_method=None, section_length=1,
                  tile_width=16, tile_height=16, meta=0, *, origin_x=0,
                  origin_y=0, bbox_x=None, bbox_y=None, bbox_width=None,
-                 bbox_height=None):
+                 bbox_height=None, chunk_size=None):
         """
         Arguments set the respective initial attributes of the grid.
         See the documentation for :class:`xsge.gfx.TileGrid` for more
         information.
         """
-        self.rd = {}
+        self.rd = {"dirty_tiles": {}, "tiles_version": 0}
+        self.__tiles = None
         self.tiles = tiles
         self.render_method = render_method
         self.section_length = section_length
@@ -2678,6 +3043,7 @@ class TileGrid:
         self.bbox_y = bbox_y
         self.bbox_width = bbox_width
         self.bbox_height = bbox_height
+        self.chunk_size = chunk_size
         self.transparent = True
         self.fps = 0
         self.speed = 0
@@ -2689,10 +3055,118 @@ class TileGrid:
         return self.__class__(
             self.tiles, render_method=self.render_method,
             section_length=self.section_length, tile_width=self.tile_width,
-            tile_height=self.tile_height, origin_x=self.origin_x,
-            origin_y=self.origin_y, fps=self.fps, bbox_x=self.bbox_x,
-            bbox_y=self.bbox_y, bbox_width=self.bbox_width,
-            bbox_height=self.bbox_height)
+            tile_height=self.tile_height, meta=self.meta,
+            origin_x=self.origin_x, origin_y=self.origin_y,
+            bbox_x=self.bbox_x, bbox_y=self.bbox_y,
+            bbox_width=self.bbox_width, bbox_height=self.bbox_height,
+            chunk_size=self.chunk_size)
+
+    def get_tile(self, i, j):
+        """
+        Return the tile at column ``i`` and row ``j`` of the grid.
+
+        Columns are counted from the start of each section, and rows
+        are counted in sections; i.e. the tile returned is the same as
+        ``self.tiles[i + j * self.section_length]``.
+        """
+        if (not 0 <= i < self.section_length or
+                not 0 <= j < len(self.tiles) // self.section_length):
+            raise IndexError("Tile position ({}, {}) is outside of the "
+                             "grid.".format(i, j))
+        return self.tiles[i + j*self.section_length]
+
+    def set_tile(self, i, j, sprite):
+        """
+        Set the tile at column ``i`` and row ``j`` of the grid.
+
+        Arguments:
+
+        - ``i`` -- The column of the tile to set.
+        - ``j`` -- The row of the tile to set.
+        - ``sprite`` -- The :class:`sge.gfx.Sprite` object to use as
+          the tile, or :const:`None` for no tile.
+
+        Calling ``self.set_tile(i, j, sprite)`` is equivalent to::
+
+            self.tiles[i + j * self.section_length] = sprite
+
+        except that :exc:`IndexError` is raised if the position is
+        outside of the grid.
+        """
+        if (not 0 <= i < self.section_length or
+                not 0 <= j < len(self.tiles) // self.section_length):
+            raise IndexError("Tile position ({}, {}) is outside of the "
+                             "grid.".format(i, j))
+        self.tiles[i + j*self.section_length] = sprite
+
+    def fill_tiles(self, i, j, width, height, sprite):
+        """
+        Set every tile in a rectangular region of the grid.
+
+        Arguments:
+
+        - ``i`` -- The column of the top-left tile of the region.
+        - ``j`` -- The row of the top-left tile of the region.
+        - ``width`` -- The number of columns in the region.
+        - ``height`` -- The number of rows in the region.
+        - ``sprite`` -- The :class:`sge.gfx.Sprite` object to use as
+          the tiles, or :const:`None` for no tiles.
+
+        Any part of the region outside of the grid is ignored.  See the
+        documentation for :meth:`set_tile` for more information.
+        """
+        rows = len(self.tiles) // self.section_length
+        imin = max(0, i)
+        imax = min(i + width, self.section_length)
+        for y in range(max(0, j), min(j + height, rows)):
+            start = y * self.section_length
+            self.tiles[start + imin:start + imax] = [sprite] * (imax - imin)
+
+    def replace_tiles(self, old, new):
+        """
+        Replace every occurrence of a tile with another.
+
+        Arguments:
+
+        - ``old`` -- The :class:`sge.gfx.Sprite` object to replace.
+          Can be :const:`None` to fill all empty spaces.
+        - ``new`` -- The :class:`sge.gfx.Sprite` object to replace
+          ``old`` with, or :const:`None` to remove the tiles.
+
+        Return the number of tiles replaced.  See the documentation for
+        :meth:`set_tile` for more information.
+        """
+        tiles = self.tiles
+        count = 0
+        for k, sprite in enumerate(tiles):
+            if sprite is old:
+                tiles[k] = new
+                count += 1
+
+        return count
+
+    def refresh_tiles(self, i=None, j=None):
+        """
+        Render the chunks of the grid (see :attr:`chunk_size`) again.
+        Changes made through :attr:`tiles` and the methods of the grid
+        are detected automatically, so this is only needed if a tile
+        should be redrawn for some other reason.
+
+        Arguments:
+
+        - ``i`` -- The column of the tile which changed.  Set to
+          :const:`None` to indicate that any tiles could have changed.
+        - ``j`` -- The row of the tile which changed.  Set to
+          :const:`None` to indicate that any tiles could have changed.
+        """
+        if i is not None and j is not None:
+            if (not 0 <= i < self.section_length or
+                    not 0 <= j < len(self.tiles) // self.section_length):
+                raise IndexError("Tile position ({}, {}) is outside of the "
+                                 "grid.".format(i, j))
+            tg_mark_dirty(self, i, j)
+        else:
+            tg_mark_dirty(self)
 
     def render(self):
         """
@@ -2710,7 +3184,7 @@ class TileGrid:
            limited.
         """
         rendered_sprite = Sprite(width=self.width, height=self.height)
-        tg_blit(self, rendered_sprite, (0, 0))
+        tg_blit(self, rendered_sprite.rd["baseimages"][0], 0, 0)
         s_refresh(rendered_sprite)
         return rendered_sprite
 
@@ -2841,15 +3315,16 @@ class TileGrid:
     def __deepcopy__(self, memo):
         tiles_copy = []
         for tile in self.tiles:
-            tiles_copy.append(tile.copy())
+            tiles_copy.append(tile.copy() if tile is not None else None)
 
         return self.__class__(
             tiles_copy, render_method=self.render_method,
             section_length=self.section_length, tile_width=self.tile_width,
-            tile_height=self.tile_height, origin_x=self.origin_x,
-            origin_y=self.origin_y, fps=self.fps, bbox_x=self.bbox_x,
-            bbox_y=self.bbox_y, bbox_width=self.bbox_width,
-            bbox_height=self.bbox_height)
+            tile_height=self.tile_height, meta=self.meta,
+            origin_x=self.origin_x, origin_y=self.origin_y,
+            bbox_x=self.bbox_x, bbox_y=self.bbox_y,
+            bbox_width=self.bbox_width, bbox_height=self.bbox_height,
+            chunk_size=self.chunk_size)
 
 
 class Font:
@@ -2920,39 +3395,7 @@ class Font:
             italic = False
 
         self.__size = value
-        self.rd["font"] = None
-
-        if isinstance(self.name, str):
-            names = [self.name]
-        else:
-            try:
-                names = list(self.name)
-            except TypeError:
-                # Most likely a non-iterable value, such as None, so we
-                # assume the default font is to be used.
-                names = []
-
-        for name in names:
-            if os.path.isfile(name):
-                self.rd["font"] = pygame.font.Font(name, self.__size)
-                break
-            elif pygame.font.match_font(name):
-                self.rd["font"] = pygame.font.SysFont(
-                    ','.join(names), self.__size)
-                break
-        else:
-            default_names = [
-                "courier", "courier new", "courier prime", "noto sans mono",
-                "noto mono", "hack", "roboto mono", "freemono",
-                "dejavu sans mono", "liberation mono", "droid sans mono",
-                "nimbus mono l", "cousine", "texgyrecursor"]
-            self.rd["font"] = pygame.font.SysFont(
-                ','.join(default_names), self.__size)
-
-        # Restore underline, bold, and italic settings.
-        self.underline = underline
-        self.bold = bold
-        self.italic = italic
+        f_load(self, bold, italic, underline)
 
     @property
     def underline(self):
@@ -2960,7 +3403,7 @@ class Font:
 
     @underline.setter
     def underline(self, value):
-        self.rd["font"].set_underline(bool(value))
+        f_load(self, self.bold, self.italic, bool(value))
 
     @property
     def bold(self):
@@ -2968,7 +3411,7 @@ class Font:
 
     @bold.setter
     def bold(self, value):
-        self.rd["font"].set_bold(bool(value))
+        f_load(self, bool(value), self.italic, self.underline)
 
     @property
     def italic(self):
@@ -2976,7 +3419,7 @@ class Font:
 
     @italic.setter
     def italic(self, value):
-        self.rd["font"].set_italic(bool(value))
+        f_load(self, self.bold, bool(value), self.underline)
 
     @property
     def linesize(self):
@@ -3032,12 +3475,7 @@ class Font:
         outline_thickness = abs(round(outline_thickness))
 
         lines = f_split_text(self, text, width)
-        text_width = 0
-        for line in lines:
-            text_width = max(text_width, self.rd["font"].size(line)[0])
-
-        if width is not None:
-            text_width = min(text_width, width)
+        text_width = f_get_size(self, lines, width)[0]
 
         return text_width + 2*outline_thickness
 
@@ -3050,14 +3488,7 @@ class Font:
 
         """
         lines = f_split_text(self, text, width)
-        if lines:
-            text_height = self.rd["font"].get_linesize() * (len(lines) - 1)
-            text_height += self.rd["font"].size(lines[-1])[1]
-        else:
-            text_height = 0
-
-        if height is not None:
-            text_height = min(text_height, height)
+        text_height = f_get_size(self, lines, None, height)[1]
 
         return text_height + 2*outline_thickness
 
@@ -3155,34 +3586,59 @@ class _PygameSpriteFont:
         self.bold = False
         self.italic = False
 
+    def get_glyph_sheet(self, color):
+        # Return a tuple in the form ``(sheet, rects)``, where ``sheet``
+        # is a surface with every frame of the sprite scaled to the
+        # font size and tinted with ``color`` side by side, and
+        # ``rects`` is a list of the area of each frame in the sheet.
+        # Tinting the whole sheet at once means there is only one cache
+        # entry per color, rather than one per glyph per color.
+        i = ("sprite_font_sheet", self, self.width, self.height,
+             tuple(color), self.sprite.rd["drawcycle"])
+        sheet = r.cache.get(i)
+        if sheet is None:
+            xscale = (self.width / self.sprite.width if self.sprite.width > 0
+                      else 1)
+            yscale = (self.height / self.sprite.height
+                      if self.sprite.height > 0 else 1)
+            images = [s_get_image(self.sprite, num, xscale=xscale,
+                                  yscale=yscale)
+                      for num in range(self.sprite.frames)]
+            surf = pygame.Surface(
+                (max(1, sum(img.get_width() for img in images)),
+                 max(1, max(img.get_height() for img in images))),
+                pygame.SRCALPHA)
+            surf.fill(pygame.Color(0, 0, 0, 0))
+            rects = []
+            x = 0
+            for img in images:
+                rects.append(surf.blit(img, (x, 0)))
+                x += img.get_width()
+            surf.fill(color, None, pygame.BLEND_RGB_MULT)
+            sheet = (surf, rects)
+
+        r.cache.add(i, sheet)
+        return sheet
+
     def render(self, text, antialias, color, background=None):
         w, h = self.size(text)
-        xscale = (self.width / self.sprite.width if self.sprite.width > 0
-                  else 1)
-        yscale = (self.height / self.sprite.height if self.sprite.height > 0
-                  else 1)
         surf = pygame.Surface((w, h), pygame.SRCALPHA)
         surf.fill(pygame.Color(0, 0, 0, 0))
         if not isinstance(color, pygame.Color):
             color = pygame.Color(color)
-        sge_color = Color((color.r, color.g, color.b, color.a))
+        sheet, rects = self.get_glyph_sheet(color)
 
+        blits = []
         for i, char in enumerate(text):
-            if text[i] in self.chars:
-                cimg = s_get_image(self.sprite, self.chars[char],
-                                   xscale=xscale, yscale=yscale,
-                                   blend=sge_color)
-                surf.blit(cimg, (int(i * (self.width+self.hsep)), 0))
-            elif text[i].swapcase() in self.chars:
-                cimg = s_get_image(self.sprite, self.chars[char.swapcase()],
-                                   xscale=xscale, yscale=yscale,
-                                   blend=sge_color)
-                surf.blit(cimg, (int(i * (self.width+self.hsep)), 0))
-            elif None in self.chars:
-                cimg = s_get_image(self.sprite, self.chars[None],
-                                   xscale=xscale, yscale=yscale,
-                                   blend=sge_color)
-                surf.blit(cimg, (int(i * (self.width+self.hsep)), 0))
+            num = self.chars.get(char)
+            if num is None:
+                num = self.chars.get(char.swapcase())
+                if num is None:
+                    num = self.chars.get(None)
+            if num is not None:
+                blits.append((sheet, (int(i * (self.width+self.hsep)), 0),
+                              rects[num % len(rects)]))
+        surf.blits(blits, False)
 
         if background is None:
             return surf
@@ -3389,3 +3845,151 @@ class Background:
             sorted_layers.insert(i, layer)
 
         self.layers = sorted_layers
+
+
+def get_sprite_index(directory=""):
+    """
+    Return the index used to find the image files of sprites in a
+    directory.
+
+    The first time a sprite is loaded from a directory, the SGE scans
+    the directory once and remembers which files each sprite name could
+    refer to, so that loading more sprites from the same directory does
+    not require scanning it again.  The index is a dictionary mapping
+    names to lists of file names (without the directory).  A file can
+    be listed under its name without the extension, as well as under
+    the part of that before the last hyphen (``-``) or underscore
+    (``_``); :meth:`sge.gfx.Sprite.__init__` decides which of the files
+    listed under a sprite's name to use.
+
+    Parameters:
+
+    - ``directory`` -- The directory to return the index of.  If it
+      has not been indexed yet, it is scanned.
+
+    The returned index can be saved (for instance, as JSON) when a game
+    is packaged and passed to :func:`sge.gfx.set_sprite_index` when the
+    game starts to avoid scanning the directory at all.
+    """
+    return {name: list(fnames)
+            for name, fnames in s_get_index(directory).items()}
+
+
+def set_sprite_index(index, directory=""):
+    """
+    Set the index used to find the image files of sprites in a
+    directory instead of scanning it.
+
+    Parameters:
+
+    - ``index`` -- The index to use, in the format returned by
+      :func:`sge.gfx.get_sprite_index`.
+    - ``directory`` -- The directory the index is for.
+
+    Unlike an index made by scanning the directory, an index set with
+    this function is never replaced by scanning the directory again
+    when no files are listed in it for a sprite being loaded; it is
+    only replaced if :func:`sge.gfx.clear_sprite_index` is called.
+    """
+    i = s_get_index_key(directory)
+    r._sprite_indexes[i] = {
+        name: list(fnames) for name, fnames in index.items()}
+    r._sprite_index_misses.pop(i, None)
+
+
+def clear_sprite_index(directory=None):
+    """
+    Forget the index used to find the image files of sprites in a
+    directory, so that it is scanned again the next time a sprite is
+    loaded from it.  This needs to be done if image files are removed
+    from or renamed in a directory, or added to it for a sprite which
+    already had files there, after sprites have been loaded from it.
+    Files for other sprites are found without doing this, since the
+    directory is scanned again the first time no files are indexed for
+    a sprite; this is not done again for the same sprite name until the
+    index changes, nor for indexes set with
+    :func:`sge.gfx.set_sprite_index`.  :meth:`sge.gfx.Sprite.save` and
+    :func:`sge.gfx.save_atlas` also forget the index of the directory
+    they save to.
+
+    Parameters:
+
+    - ``directory`` -- The directory to forget the index of.  Set to
+      :const:`None` to forget the indexes of all directories.
+    """
+    if directory is None:
+        r._sprite_indexes.clear()
+        r._sprite_index_misses.clear()
+    else:
+        s_clear_index(directory)
+
+
+def save_atlas(fname, sprites):
+    """
+    Save sprites to a sprite atlas which can be loaded with
+    :meth:`sge.gfx.Sprite.from_atlas`.
+
+    Parameters:
+
+    - ``fname`` -- The path of the JSON file to save the atlas to.  The
+      image of the atlas is saved next to it, with the same name and a
+      ``.png`` extension.  If either file cannot be saved,
+      :exc:`OSError` is raised.
+    - ``sprites`` -- A dictionary mapping the names to save the sprites
+      under to the sprites to save.
+
+    The frames of all of the sprites are packed into the image as
+    tightly as possible.  The origin, bounding box, animation rate, and
+    transparency of each sprite are saved in the JSON file.
+    """
+    sizes = []
+    frames = []
+    for name, sprite in sprites.items():
+        for i in range(sprite.frames):
+            sizes.append((round(sprite.width), round(sprite.height)))
+            frames.append((name, i))
+
+    positions, size = s_pack_atlas(sizes)
+    image = pygame.Surface((max(1, size[0]), max(1, size[1])),
+                           pygame.SRCALPHA)
+    image.fill(pygame.Color(0, 0, 0, 0))
+
+    root, ext = os.path.splitext(fname)
+    image_fname = root + ".png"
+    index = {"image": os.path.basename(image_fname), "sprites": {}}
+    for name, sprite in sprites.items():
+        transparent = sprite.transparent
+        if isinstance(transparent, Color):
+            transparent = [transparent.red, transparent.green,
+                           transparent.blue, transparent.alpha]
+        else:
+            transparent = bool(transparent)
+
+        index["sprites"][name] = {
+            "width": round(sprite.width), "height": round(sprite.height),
+            "origin_x": sprite.origin_x, "origin_y": sprite.origin_y,
+            "fps": sprite.fps, "bbox_x": sprite.bbox_x,
+            "bbox_y": sprite.bbox_y, "bbox_width": sprite.bbox_width,
+            "bbox_height": sprite.bbox_height, "transparent": transparent,
+            "frames": []}
+
+    for (name, i), (x, y) in zip(frames, positions):
+        image.blit(sprites[name].rd["baseimages"][i], (x, y))
+        index["sprites"][name]["frames"].append([x, y])
+
+    try:
+        pygame.image.save(image, image_fname)
+    except pygame.error:
+        m = 'Couldn\'t save to "{}"'.format(
+            os.path.normpath(os.path.realpath(image_fname)))
+        raise OSError(m)
+
+    with open(fname, "w") as f:
+        json.dump(index, f)
+
+    # Make sure the new atlas is used if the old one was loaded, and
+    # that its files can be found if the directory was indexed before.
+    i = os.path.normcase(os.path.abspath(fname))
+    r._atlas_indexes.pop(i, None)
+    r._atlas_images.pop(i, None)
+    s_clear_index(os.path.dirname(fname))
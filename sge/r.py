@@ -20,10 +20,17 @@ functions and variables.
 """
 
 
+import collections
+import concurrent.futures
+import hashlib
 import inspect
+import json
 import math
+import mmap
 import os
 import random
+import re
+import sys
 import time
 import warnings
 import weakref
@@ -36,6 +43,13 @@ try:
 except ImportError:
     USE_UNISEG = False
 
+try:
+    import numpy
+    import pygame.surfarray
+    USE_NUMPY = True
+except ImportError:
+    USE_NUMPY = False
+
 import sge
 
 
@@ -45,6 +59,46 @@ CACHE_PRUNE_TIME = 8000
 # How long cached items should remain cached by default in seconds.
 CACHE_DEFAULT_LIFE = 15
 
+# Memory budget of each cache category in bytes.  When a category goes
+# over its budget, its least recently used values are evicted.
+CACHE_BUDGETS = {"images": 64 * 1024 * 1024, "masks": 16 * 1024 * 1024,
+                 "text": 16 * 1024 * 1024, "shapes": 8 * 1024 * 1024,
+                 "tiles": 64 * 1024 * 1024, "misc": 1024 * 1024}
+
+# Names of the counters kept for each cache category.
+CACHE_COUNTERS = ("hits", "misses", "inserts", "evictions", "expirations",
+                  "rejections")
+
+# Which cache category values belong to, based on the first item of
+# their index.  Any index not listed here goes into "misc".
+CACHE_CATEGORIES = {
+    "s_image": "images", "s_mask": "masks", "o_mask": "masks",
+    "rectangle_masks": "masks", "ellipse_masks": "masks",
+    "circle_masks": "masks", "line_masks": "masks", "text_sprite": "text",
+    "text_line": "text", "text_split": "text", "sprite_font_sheet": "text",
+    "font": "text",
+    "dot_sprite": "shapes", "line_sprite": "shapes",
+    "rectangle_sprite": "shapes", "ellipse_sprite": "shapes",
+    "circle_sprite": "shapes", "polyline_sprite": "shapes",
+    "polygon_sprite": "shapes", "tg_chunk": "tiles"}
+
+# Version of the format of asset cache files.  Changing it makes files
+# written by older versions be ignored.
+ASSET_CACHE_VERSION = 1
+
+# Fonts to use if none of the fonts requested are found.
+FONT_DEFAULT_NAMES = [
+    "courier", "courier new", "courier prime", "noto sans mono", "noto mono",
+    "hack", "roboto mono", "freemono", "dejavu sans mono", "liberation mono",
+    "droid sans mono", "nimbus mono l", "cousine", "texgyrecursor"]
+
+# Lines of text made only of plain words, optionally followed by
+# punctuation and spaces.  The Unicode line breaking algorithm only
+# allows breaks after the spaces in these, so they can be split into
+# line break units without uniseg, which is much slower.
+SIMPLE_TEXT = re.compile(r" *(?:[A-Za-z0-9'\"]+[.,;:!?]*(?: +|$))*")
+SIMPLE_TEXT_UNITS = re.compile(r"\S+ *| +")
+
 # Lists of objects that are tangible and objects that check for
 # collisions; makes collision detection more efficient.
 _colliders = []
@@ -61,48 +115,234 @@ _prev_hats = {}
 # Display info
 _display_info = None
 
+# Window surface, set by _set_mode
+game_window = None
+
+# Surfaces reused by _scale_blit when scaling the display
+_scale_buffers = {}
+
+# Font files found for each tuple of font names, so that the file system
+# and the system font list are only searched once for each font.
+_font_paths = {}
+
+# Font used for the default pause image, created on the first pause
+game_pause_font = None
+
+# Images and sounds being loaded in the background by sge.dsp.preload,
+# indexed by kind and normalized file name.  Each value is a future of
+# the loaded surface or sound, removed once it is used.
+_preloads = {}
+
+# All futures of the current sge.dsp.preload batches, used to report
+# progress.
+_preload_futures = []
+
+# Indexes of the files in each directory sprites are loaded from,
+# indexed by normalized directory.  Each index is a dictionary mapping
+# sprite names to the names of the files which may belong to them.
+_sprite_indexes = {}
+
+# Names of the sprites no files were found for in each index built by
+# scanning a directory, so that the directory is only scanned again
+# for them after the index changes.  Indexes set with
+# sge.gfx.set_sprite_index are not listed, since they are never
+# replaced by scanning.
+_sprite_index_misses = {}
+
+# Metadata of sprite atlases, indexed by normalized file name, and the
+# converted images of the atlases currently used by any sprite.
+_atlas_indexes = {}
+_atlas_images = weakref.WeakValueDictionary()
+
+# Thread pool used to decode upcoming frames of lazily loaded sprites,
+# created when it is first needed.
+_prefetch_executor = None
+
+# Directory of the on-disk asset cache set by sge.dsp.set_asset_cache,
+# or None if it is disabled.
+_asset_cache_dir = None
+
+# Content hashes of the files images in the asset cache are loaded
+# from, indexed by absolute file name.  Each value is a tuple of
+# ``(stamp, digest)``, where ``stamp`` is the size and modification
+# time of the file when it was hashed.
+_asset_file_hashes = {}
+
 # Index of sound initialization
 sound_init = 0
 
 
 class cache:
 
+    # Cached values are kept in one ordered dictionary per category,
+    # ordered from least recently used to most recently used.  Each
+    # entry is a list of ``[value, size, stamp]``, where ``size`` is
+    # the estimated number of bytes used by the value and ``stamp`` is
+    # the time it was last used.
+
     prune_time = 0
-    _cache = {}
-    _prune = {}
+    log_interval = None
+    log_time = 0
+    log_function = None
+    clock = time.time()
+    budgets = dict(CACHE_BUDGETS)
+    _cache = {category: collections.OrderedDict()
+              for category in CACHE_BUDGETS}
+    _bytes = dict.fromkeys(CACHE_BUDGETS, 0)
+    _stats = {category: dict.fromkeys(CACHE_COUNTERS, 0)
+              for category in CACHE_BUDGETS}
 
     @classmethod
-    def add(cls, i, value, prune_time=CACHE_DEFAULT_LIFE):
-        # Add value with index ``i`` to cache as ``value``.
-        # Automatically deleted after ``prune_time`` seconds.
-        cls._cache[i] = value
-        cls._prune[i] = time.time() + prune_time
+    def add(cls, i, value):
+        # Add value with index ``i`` to cache as ``value``.  The
+        # least recently used values in the same category are evicted
+        # if this puts the category over its budget, and the value is
+        # deleted by ``prune`` if it goes unused for
+        # ``CACHE_DEFAULT_LIFE`` seconds.
+        category = CACHE_CATEGORIES.get(i[0], "misc")
+        entries = cls._cache[category]
+        entry = entries.get(i)
+        if entry is not None:
+            entries.move_to_end(i)
+            entry[2] = cls.clock
+            if entry[0] is value:
+                return
+            cls._bytes[category] -= entry[1]
+            del entries[i]
+
+        stats = cls._stats[category]
+        size = _cache_sizeof(value)
+        budget = cls.budgets[category]
+        if size > budget:
+            stats["rejections"] += 1
+            return
+
+        entries[i] = [value, size, cls.clock]
+        cls._bytes[category] += size
+        stats["inserts"] += 1
+        while cls._bytes[category] > budget:
+            old_i, old_entry = entries.popitem(last=False)
+            cls._bytes[category] -= old_entry[1]
+            stats["evictions"] += 1
 
     @classmethod
     def get(cls, i):
         # Get value with index ``i`` from cache, or ``None`` if it is
         # not in the cache.
-        return cls._cache.get(i)
+        category = CACHE_CATEGORIES.get(i[0], "misc")
+        entries = cls._cache[category]
+        entry = entries.get(i)
+        if entry is None:
+            cls._stats[category]["misses"] += 1
+            return None
+
+        cls._stats[category]["hits"] += 1
+        entries.move_to_end(i)
+        entry[2] = cls.clock
+        return entry[0]
+
+    @classmethod
+    def set_budget(cls, category, size):
+        # Set the budget of ``category`` to ``size`` bytes, evicting
+        # least recently used values as needed.
+        if category not in cls.budgets:
+            raise ValueError("{} is not a cache category.".format(
+                repr(category)))
+
+        cls.budgets[category] = size
+        entries = cls._cache[category]
+        while entries and cls._bytes[category] > size:
+            old_i, old_entry = entries.popitem(last=False)
+            cls._bytes[category] -= old_entry[1]
+            cls._stats[category]["evictions"] += 1
 
     @classmethod
     def clear(cls):
         # Clear all saved values from the cache.
-        cls._cache = {}
-        cls._prune = {}
+        for category in cls._cache:
+            cls._cache[category].clear()
+            cls._bytes[category] = 0
 
     @classmethod
     def prune(cls):
-        # Prune all expired values. Should be called infrequently (maybe
-        # every 5 seconds or so), because it requires looping through
-        # every cached value.
-        p = []
-        for i in cls._prune:
-            if cls._prune[i] < time.time():
-                p.append(i)
+        # Prune all expired values.  Because each category is ordered
+        # by last use, this only has to look at the values which are
+        # actually expired (plus one more per category).
+        cls.clock = time.time()
+        expire = cls.clock - CACHE_DEFAULT_LIFE
+        for category, entries in cls._cache.items():
+            while entries:
+                old_i = next(iter(entries))
+                old_entry = entries[old_i]
+                if old_entry[2] >= expire:
+                    break
+                del entries[old_i]
+                cls._bytes[category] -= old_entry[1]
+                cls._stats[category]["expirations"] += 1
 
-        for i in p:
-            del cls._cache[i]
-            del cls._prune[i]
+    @classmethod
+    def get_stats(cls):
+        # Return a dictionary of the counters of each category, with
+        # the number of entries, bytes used and budget added in.
+        info = {}
+        for category, stats in cls._stats.items():
+            d = stats.copy()
+            d["entries"] = len(cls._cache[category])
+            d["bytes"] = cls._bytes[category]
+            d["budget"] = cls.budgets[category]
+            info[category] = d
+
+        return info
+
+    @classmethod
+    def reset_stats(cls):
+        # Reset all counters to zero.
+        for stats in cls._stats.values():
+            for counter in stats:
+                stats[counter] = 0
+
+    @classmethod
+    def log_stats(cls):
+        # Pass a summary of the cache statistics to the log function,
+        # or issue it as a warning if there is none.
+        lines = ["SGE cache statistics:"]
+        for category, d in cls.get_stats().items():
+            lookups = d["hits"] + d["misses"]
+            ratio = d["hits"] / lookups if lookups else 0
+            lines.append(
+                "  {}: {} hits, {} misses ({:.1%} hit rate), {} inserts, "
+                "{} evictions, {} expirations, {} rejections; {} entries "
+                "using {:.1f} of {:.1f} KiB".format(
+                    category, d["hits"], d["misses"], ratio, d["inserts"],
+                    d["evictions"], d["expirations"], d["rejections"],
+                    d["entries"], d["bytes"] / 1024, d["budget"] / 1024))
+
+        summary = "\n".join(lines)
+        if cls.log_function is not None:
+            cls.log_function(summary)
+        else:
+            warnings.warn(summary)
+
+
+def _cache_sizeof(value):
+    # Estimate how many bytes ``value`` takes up in the cache.
+    if isinstance(value, pygame.Surface):
+        return value.get_pitch() * value.get_height()
+    elif isinstance(value, sge.gfx.Sprite):
+        return sum(_cache_sizeof(image) for image in value.rd["baseimages"])
+    elif isinstance(value, tuple):
+        return sum(_cache_sizeof(item) for item in value if item is not None)
+    elif isinstance(value, str):
+        return sys.getsizeof(value)
+    elif isinstance(value, list):
+        # Collision masks are lists of columns of bools; count each
+        # item as a pointer plus the overhead of each column list.
+        if value and isinstance(value[0], list):
+            return len(value) * (len(value[0]) * 8 + 56) + 56
+        else:
+            return len(value) * 8 + 56
+    else:
+        return 64
 
 
 def _check_color_input(value):
@@ -149,6 +389,73 @@ def _scale(surface, width, height):
     return new_surf
 
 
+def _scale_blit(dest, surface, x, y, width, height, buffers):
+    # Blit ``surface`` onto ``dest`` at (``x``, ``y``) scaled to the
+    # given width and height.  Unlike _scale, this doesn't allocate any
+    # surfaces: it scales directly into ``dest`` if possible, and
+    # otherwise into surfaces which are kept in the dictionary
+    # ``buffers`` and reused as long as the size stays the same.
+    # ``surface`` must be opaque.
+    width = round(width)
+    height = round(height)
+    x = int(x)
+    y = int(y)
+    if surface.get_width() == width and surface.get_height() == height:
+        dest.blit(surface, (x, y))
+        return
+
+    rect = pygame.Rect(x, y, width, height)
+    direct = (dest.get_rect().contains(rect) and
+              dest.get_bitsize() == surface.get_bitsize() and
+              dest.get_masks() == surface.get_masks())
+    if direct:
+        target = dest.subsurface(rect)
+    else:
+        target = _get_scale_buffer(buffers, "target", width, height, surface)
+
+    if (sge.game.scale_method == "smooth" and
+            surface.get_bitsize() in {24, 32}):
+        pygame.transform.smoothscale(surface, (width, height), target)
+    elif sge.game.scale_method == "scale2x":
+        src = surface
+        n = 0
+        while width > src.get_width() or height > src.get_height():
+            buf = _get_scale_buffer(buffers, ("scale2x", n),
+                                    src.get_width() * 2, src.get_height() * 2,
+                                    surface)
+            try:
+                pygame.transform.scale2x(src, buf)
+            except pygame.error:
+                break
+            src = buf
+            n += 1
+
+        if src.get_width() == width and src.get_height() == height:
+            target.blit(src, (0, 0))
+        else:
+            pygame.transform.scale(src, (width, height), target)
+    else:
+        pygame.transform.scale(surface, (width, height), target)
+
+    if not direct:
+        dest.blit(target, (x, y))
+
+
+def _get_scale_buffer(buffers, i, width, height, like):
+    # Return the surface in ``buffers`` with index ``i``, replacing it
+    # if it doesn't have the given size and the same format as
+    # ``like``.
+    buf = buffers.get(i)
+    if (buf is None or buf.get_width() != width or
+            buf.get_height() != height or
+            buf.get_bitsize() != like.get_bitsize() or
+            buf.get_masks() != like.get_masks()):
+        buf = pygame.Surface((width, height), 0, like)
+        buffers[i] = buf
+
+    return buf
+
+
 def _get_blend_flags(blend_mode):
     # Return the appropriate Pygame flags for the given blend mode.
     pygame_flags = {
@@ -168,37 +475,93 @@ def _get_blend_flags(blend_mode):
 
 
 def _screen_blend(dest, source, dest_x, dest_y, alpha=False):
-    dest.lock()
-    source.lock()
-    destpix = pygame.PixelArray(dest)
-    sourcepix = pygame.PixelArray(source)
-    xmin = max(0, dest_x)
-    ymin = max(0, dest_y)
-    xlen = min(source.get_width(), dest.get_width() - dest_x)
-    ylen = min(source.get_height(), dest.get_height() - dest_y)
-
-    for x in range(xmin, xlen):
-        for y in range(ymin, ylen):
-            dx = dest_x + x
-            dy = dest_y + y
-            dc = dest.unmap_rgb(destpix[dx, dy])
-            sc = source.unmap_rgb(sourcepix[x, y])
-
-            def blended_component(c1, c2):
-                return int(255 - (((255 - c1) / 255) *
-                                  ((255 - c2) / 255) * 255))
-
-            r = blended_component(dc.r, sc.r)
-            g = blended_component(dc.g, sc.g)
-            b = blended_component(dc.b, sc.b)
-            a = blended_component(dc.a, sc.a) if alpha else dc.a
-
-            destpix[dx, dy] = dest.map_rgb((r, g, b, a))
-
-    destpix.close()
-    sourcepix.close()
-    dest.unlock()
-    source.unlock()
+    # Screen blend ``source`` onto ``dest`` at (``dest_x``, ``dest_y``).
+    # Each resulting component is 255 - (255 - d) * (255 - s) / 255.
+    dest_x = int(dest_x)
+    dest_y = int(dest_y)
+    xmin = max(0, -dest_x)
+    ymin = max(0, -dest_y)
+    xmax = min(source.get_width(), dest.get_width() - dest_x)
+    ymax = min(source.get_height(), dest.get_height() - dest_y)
+    if xmin >= xmax or ymin >= ymax:
+        return
+
+    if (USE_NUMPY and dest.get_bitsize() in {24, 32} and
+            source.get_bitsize() in {24, 32}):
+        _screen_blend_numpy(dest, source, dest_x, dest_y, xmin, ymin, xmax,
+                            ymax, alpha)
+    else:
+        _screen_blend_flags(dest, source, dest_x, dest_y, xmin, ymin, xmax,
+                            ymax, alpha)
+
+
+def _screen_blend_numpy(dest, source, dest_x, dest_y, xmin, ymin, xmax, ymax,
+                        alpha):
+    # Screen blend using NumPy arrays referencing the surfaces' pixels.
+    def screen(d, s):
+        inverse = ((255 - d.astype(numpy.uint16)) *
+                   (255 - s.astype(numpy.uint16)))
+        d[...] = 255 - (inverse + 254) // 255
+
+    dx = slice(dest_x + xmin, dest_x + xmax)
+    dy = slice(dest_y + ymin, dest_y + ymax)
+    sx = slice(xmin, xmax)
+    sy = slice(ymin, ymax)
+
+    destpix = pygame.surfarray.pixels3d(dest)
+    sourcepix = pygame.surfarray.pixels3d(source)
+    screen(destpix[dx, dy], sourcepix[sx, sy])
+    del destpix, sourcepix
+
+    if alpha and dest.get_flags() & pygame.SRCALPHA:
+        destpix = pygame.surfarray.pixels_alpha(dest)
+        if source.get_flags() & pygame.SRCALPHA:
+            sourcepix = pygame.surfarray.pixels_alpha(source)
+            screen(destpix[dx, dy], sourcepix[sx, sy])
+            del sourcepix
+        else:
+            # Screening anything with full opacity is full opacity.
+            destpix[dx, dy] = 255
+        del destpix
+
+
+def _screen_blend_flags(dest, source, dest_x, dest_y, xmin, ymin, xmax, ymax,
+                        alpha):
+    # Screen blend using Pygame's blend flags, as the inverse of
+    # multiplying the inverses of both surfaces.  The results can be
+    # off by one compared to _screen_blend_numpy because of how Pygame
+    # rounds multiplication.
+    w = xmax - xmin
+    h = ymax - ymin
+    area = pygame.Rect(xmin, ymin, w, h)
+    dest_rect = pygame.Rect(dest_x + xmin, dest_y + ymin, w, h)
+    if alpha:
+        white = (255, 255, 255, 255)
+        sub_flag = pygame.BLEND_RGBA_SUB
+        mult_flag = pygame.BLEND_RGBA_MULT
+        add_flag = pygame.BLEND_RGBA_ADD
+    else:
+        white = (255, 255, 255)
+        sub_flag = pygame.BLEND_RGB_SUB
+        mult_flag = pygame.BLEND_RGB_MULT
+        add_flag = pygame.BLEND_RGB_ADD
+
+    inverse = pygame.Surface((w, h), pygame.SRCALPHA)
+    inverse.fill((255, 255, 255, 255))
+    inverse.blit(dest, (0, 0), dest_rect, sub_flag)
+    source_inverse = pygame.Surface((w, h), pygame.SRCALPHA)
+    source_inverse.fill((255, 255, 255, 255))
+    source_inverse.blit(source, (0, 0), area, sub_flag)
+    inverse.blit(source_inverse, (0, 0), None, mult_flag)
+
+    result = pygame.Surface((w, h), pygame.SRCALPHA)
+    result.fill((255, 255, 255, 255))
+    result.blit(inverse, (0, 0), None, sub_flag)
+
+    # Clear the blended channels of the destination, then add the
+    # result to them.
+    dest.fill((0, 0, 0, 0) if alpha else (0, 0, 0), dest_rect, mult_flag)
+    dest.blit(result, dest_rect, None, add_flag)
 
 
 def _apply_shader(dest, x, y, width, height, shader):
@@ -215,6 +578,40 @@ def _apply_shader(dest, x, y, width, height, shader):
     pixarray.close()
 
 
+def _apply_array_shader(dest, x, y, width, height, shader):
+    # Apply an array shader to surface ``dest``, passing the whole area
+    # to the shader at once as NumPy arrays.  Note: caller must lock()
+    # and unlock() ``dest``.
+    x1 = max(x, 0)
+    y1 = max(y, 0)
+    x2 = min(x + width, dest.get_width())
+    y2 = min(y + height, dest.get_height())
+    if x1 >= x2 or y1 >= y2:
+        return
+
+    rgb = pygame.surfarray.pixels3d(dest)[x1:x2, y1:y2]
+    if dest.get_flags() & pygame.SRCALPHA:
+        alpha = pygame.surfarray.pixels_alpha(dest)[x1:x2, y1:y2]
+    else:
+        alpha = None
+
+    xx, yy = numpy.mgrid[x1:x2, y1:y2]
+    red = rgb[:, :, 0].astype(numpy.int32)
+    green = rgb[:, :, 1].astype(numpy.int32)
+    blue = rgb[:, :, 2].astype(numpy.int32)
+    if alpha is not None:
+        a = alpha.astype(numpy.int32)
+    else:
+        a = numpy.full(red.shape, 255, numpy.int32)
+
+    red, green, blue, a = shader(xx, yy, red, green, blue, a)
+    rgb[:, :, 0] = numpy.clip(red, 0, 255)
+    rgb[:, :, 1] = numpy.clip(green, 0, 255)
+    rgb[:, :, 2] = numpy.clip(blue, 0, 255)
+    if alpha is not None:
+        alpha[...] = numpy.clip(a, 0, 255)
+
+
 def _set_mode(resize_only=False):
     # Set the mode of the screen based on self.width, self.height,
     # and self.fullscreen.
@@ -227,7 +624,24 @@ def _set_mode(resize_only=False):
     global game_x
     global game_y
     game = sge.game
-    game_display_surface = _scale(game_display_surface, game.width, game.height)
+
+    if game.hardware_rendering:
+        try:
+            _set_mode_hardware(resize_only)
+        except pygame.error as e:
+            w = ("Hardware rendering is unavailable ({}); falling back to "
+                 "software rendering.".format(e))
+            warnings.warn(w)
+        else:
+            return
+
+    if game_display_surface is game_window:
+        # Last mode was hardware rendered, so the display surface
+        # belongs to the old window.
+        game_display_surface = pygame.Surface((game.width, game.height))
+    else:
+        game_display_surface = _scale(game_display_surface, game.width,
+                                      game.height)
 
     if game.scale:
         game_xscale = game.scale
@@ -325,6 +739,67 @@ def _set_mode(resize_only=False):
         game_y = round((h - game.height*game_yscale) / 2)
 
 
+def _set_mode_hardware(resize_only=False):
+    # Set the mode of the screen so that SDL's renderer scales the
+    # display to the window.  The window is then used directly as a
+    # display of the game's size, so no scaling is done in software.
+    # Raises pygame.error if a renderer can't be created or the one
+    # created isn't hardware accelerated.
+    global game_display_surface
+    global game_xscale
+    global game_yscale
+    global game_window
+    global game_window_width
+    global game_window_height
+    global game_x
+    global game_y
+    game = sge.game
+
+    # This has to be set before the renderer is created.
+    if game.scale_method == "smooth":
+        os.environ["SDL_RENDER_SCALE_QUALITY"] = "linear"
+    else:
+        os.environ["SDL_RENDER_SCALE_QUALITY"] = "nearest"
+
+    fullscreen = game.fullscreen or not _display_info.wm
+    if (not resize_only or game_display_surface is not game_window or
+            pygame.get_sdl_version()[0] < 2):
+        if fullscreen:
+            flags = pygame.SCALED | pygame.FULLSCREEN
+        else:
+            flags = pygame.SCALED | pygame.RESIZABLE
+
+        # Pygame falls back to SDL's software renderer if no accelerated
+        # one is available, which it only reports with a warning.
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            game_window = pygame.display.set_mode((game.width, game.height),
+                                                  flags)
+
+        for warning in caught:
+            if "no fast renderer" in str(warning.message):
+                raise pygame.error("no accelerated renderer available")
+            warnings.warn_explicit(warning.message, warning.category,
+                                   warning.filename, warning.lineno)
+
+        if not fullscreen:
+            if game.scale:
+                size = (int(game.width * game.scale),
+                        int(game.height * game.scale))
+            else:
+                size = (game_window_width, game_window_height)
+
+            from pygame._sdl2.video import Window
+            Window.from_display_module().size = size
+
+    game_window_width, game_window_height = pygame.display.get_window_size()
+    game_display_surface = game_window
+    game_xscale = 1
+    game_yscale = 1
+    game_x = 0
+    game_y = 0
+
+
 def _get_channel():
     # Return a channel for a sound effect to use.
     assert pygame.mixer.get_init()
@@ -541,6 +1016,186 @@ def _get_polygon_sprite(points, fill, outline, outline_thickness, anti_alias):
     return sprite
 
 
+def _can_draw_primitive(blend_mode, anti_alias, *colors):
+    # Return whether a projected shape can be drawn straight onto its
+    # destination at refresh time with the same result as projecting a
+    # sprite of it.  This is only the case when the shape is opaque and
+    # doesn't need to be blended.
+    return (blend_mode in {None, sge.BLEND_NORMAL} and not anti_alias and
+            all(color is None or color.alpha == 255 for color in colors))
+
+
+def _get_dot_primitive(color, blend_mode):
+    # Return a primitive for the given dot, or None if a sprite must be
+    # used instead.  Primitives are tuples in the form
+    # ``(kind, (origin_x, origin_y, width, height), ...)``, describing
+    # the sprite the shape would otherwise be drawn on; the shape is
+    # drawn with the same arguments as it would be on that sprite.
+    if not _can_draw_primitive(blend_mode, False, color):
+        return None
+    return ("dot", (0, 0, 1, 1), tuple(color))
+
+
+def _get_line_primitive(x1, y1, x2, y2, color, thickness, anti_alias,
+                        blend_mode):
+    # Return a primitive for the given line, or None if a sprite must be
+    # used instead.  Coordinates are relative to the projected position,
+    # just like in the sprite returned by _get_line_sprite.
+    if not _can_draw_primitive(blend_mode, anti_alias, color):
+        return None
+    bounds = (0, 0, round(abs(x2 - x1) + thickness),
+              round(abs(y2 - y1) + thickness))
+    return ("line", bounds, tuple(color), (round(x1), round(y1)),
+            (round(x2), round(y2)), abs(round(thickness)))
+
+
+def _get_rectangle_primitive(width, height, fill, outline, outline_thickness,
+                             blend_mode):
+    # Return a primitive for the given rectangle, or None if a sprite
+    # must be used instead.
+    if not _can_draw_primitive(blend_mode, False, fill, outline):
+        return None
+    outline_thickness = abs(outline_thickness)
+    draw_x = outline_thickness // 2
+    draw_y = outline_thickness // 2
+    bounds = (0, 0, width + outline_thickness, height + outline_thickness)
+    rect = (round(draw_x), round(draw_y), round(width), round(height))
+    return ("rectangle", bounds, rect,
+            tuple(fill) if fill is not None else None,
+            tuple(outline) if outline is not None else None,
+            round(outline_thickness))
+
+
+def _get_ellipse_primitive(width, height, fill, outline, outline_thickness,
+                           anti_alias, blend_mode):
+    # Return a primitive for the given ellipse, or None if a sprite must
+    # be used instead.
+    if not _can_draw_primitive(blend_mode, anti_alias, fill, outline):
+        return None
+    outline_thickness = abs(outline_thickness)
+    draw_x = outline_thickness // 2
+    draw_y = outline_thickness // 2
+    bounds = (0, 0, width + outline_thickness, height + outline_thickness)
+    rect = (round(draw_x), round(draw_y), round(width), round(height))
+    return ("ellipse", bounds, rect,
+            tuple(fill) if fill is not None else None,
+            tuple(outline) if outline is not None else None,
+            round(outline_thickness))
+
+
+def _get_circle_primitive(radius, fill, outline, outline_thickness,
+                          anti_alias, blend_mode):
+    # Return a primitive for the given circle, or None if a sprite must
+    # be used instead.
+    if not _can_draw_primitive(blend_mode, anti_alias, fill, outline):
+        return None
+    outline_thickness = abs(outline_thickness)
+    xy = round(radius + outline_thickness // 2)
+    wh = 2 * radius + outline_thickness
+    return ("circle", (0, 0, wh, wh), (xy, xy), round(radius),
+            tuple(fill) if fill is not None else None,
+            tuple(outline) if outline is not None else None,
+            round(outline_thickness))
+
+
+def _get_polyline_primitive(points, color, thickness, anti_alias, blend_mode):
+    # Return a primitive for the given polyline, or None if a sprite
+    # must be used instead.
+    if not _can_draw_primitive(blend_mode, anti_alias, color):
+        return None
+    x = min(point[0] for point in points)
+    y = min(point[1] for point in points)
+    width = max(point[0] for point in points) - x
+    height = max(point[1] for point in points) - y
+    thickness = abs(thickness)
+    draw_x = thickness // 2
+    draw_y = thickness // 2
+    bounds = (draw_x, draw_y, width + thickness, height + thickness)
+    dpoints = [(a - x + draw_x, b - y + draw_y) for (a, b) in points]
+    return ("polyline", bounds, tuple(color), dpoints, round(thickness))
+
+
+def _get_polygon_primitive(points, fill, outline, outline_thickness,
+                           anti_alias, blend_mode):
+    # Return a primitive for the given polygon, or None if a sprite
+    # must be used instead.
+    if not _can_draw_primitive(blend_mode, anti_alias, fill, outline):
+        return None
+    x = min(point[0] for point in points)
+    y = min(point[1] for point in points)
+    width = max(point[0] for point in points) - x
+    height = max(point[1] for point in points) - y
+    outline_thickness = abs(outline_thickness)
+    draw_x = outline_thickness // 2
+    draw_y = outline_thickness // 2
+    bounds = (draw_x, draw_y, width + outline_thickness,
+              height + outline_thickness)
+    dpoints = [(a - x + draw_x, b - y + draw_y) for (a, b) in points]
+    return ("polygon", bounds, dpoints,
+            tuple(fill) if fill is not None else None,
+            tuple(outline) if outline is not None else None,
+            round(outline_thickness))
+
+
+def _draw_primitive(dest, primitive, x, y):
+    # Draw a primitive returned by one of the _get_*_primitive functions
+    # onto ``dest`` with its origin at (x, y).  The shape is drawn in
+    # the coordinates of the sprite it replaces, onto a subsurface of
+    # ``dest`` if that sprite is entirely within the clipping area, or
+    # onto a surface of the sprite's size otherwise, so that the result
+    # is exactly the same as projecting the sprite.
+    kind = primitive[0]
+    origin_x, origin_y, width, height = primitive[1]
+    rect = pygame.Rect(int(x - origin_x), int(y - origin_y), round(width),
+                       round(height))
+    if rect.width <= 0 or rect.height <= 0:
+        return
+
+    if dest.get_clip().contains(rect):
+        surf = dest.subsurface(rect)
+        stamp = None
+    else:
+        surf = pygame.Surface(rect.size, pygame.SRCALPHA)
+        surf.fill(pygame.Color(0, 0, 0, 0))
+        stamp = surf
+
+    if kind == "dot":
+        surf.set_at((0, 0), primitive[2])
+    elif kind == "line":
+        color, start, end, thickness = primitive[2:]
+        pygame.draw.line(surf, color, start, end, thickness)
+    elif kind in {"rectangle", "ellipse"}:
+        rect_, fill, outline, thickness = primitive[2:]
+        if kind == "rectangle":
+            if fill is not None:
+                surf.fill(fill, rect_)
+            if outline is not None and thickness:
+                pygame.draw.rect(surf, outline, rect_, thickness)
+        else:
+            if fill is not None:
+                pygame.draw.ellipse(surf, fill, rect_)
+            if outline is not None and thickness:
+                pygame.draw.ellipse(surf, outline, rect_, thickness)
+    elif kind == "circle":
+        center, radius, fill, outline, thickness = primitive[2:]
+        if fill is not None:
+            pygame.draw.circle(surf, fill, center, radius)
+        if outline is not None and thickness:
+            pygame.draw.circle(surf, outline, center, radius, thickness)
+    elif kind == "polyline":
+        color, points, thickness = primitive[2:]
+        pygame.draw.lines(surf, color, False, points, thickness)
+    elif kind == "polygon":
+        points, fill, outline, thickness = primitive[2:]
+        if fill is not None:
+            pygame.draw.polygon(surf, fill, points, 0)
+        if outline is not None and thickness:
+            pygame.draw.polygon(surf, outline, points, thickness)
+
+    if stamp is not None:
+        dest.blit(stamp, rect)
+
+
 def _get_hat(joystick, hat):
     # Return the position of a joystick HAT.
     if (joystick is not None and joystick < len(game_joysticks) and
@@ -550,6 +1205,48 @@ def _get_hat(joystick, hat):
         return (0, 0)
 
 
+def _get_preload_key(kind, fname):
+    return (kind, os.path.normcase(os.path.abspath(fname)))
+
+
+def _preload(kind, fname, executor):
+    # Start loading a file in the background with ``executor``.
+    i = _get_preload_key(kind, fname)
+    if i not in _preloads:
+        if kind == "image":
+            future = executor.submit(pygame.image.load, fname)
+        else:
+            future = executor.submit(pygame.mixer.Sound, fname)
+        _preloads[i] = future
+        _preload_futures.append(future)
+
+
+def _load_image(fname):
+    # Load an image file, using the surface loaded by sge.dsp.preload
+    # if there is one.  The surface is not converted, since that can
+    # only be done in the main thread.
+    future = _preloads.pop(_get_preload_key("image", fname), None)
+    if future is not None:
+        return future.result()
+    return pygame.image.load(fname)
+
+
+def _discard_preloads(fnames):
+    # Forget the images preloaded from ``fnames``, since they are not
+    # going to be used.
+    for fname in fnames:
+        _preloads.pop(_get_preload_key("image", fname), None)
+
+
+def _load_sound(fname):
+    # Load a sound file, using the sound loaded by sge.dsp.preload if
+    # there is one.
+    future = _preloads.pop(_get_preload_key("sound", fname), None)
+    if future is not None:
+        return future.result()
+    return pygame.mixer.Sound(fname)
+
+
 def bl_update(self, time_passed):
     # Update the animation frame.
     if self.rd["fps"] != self.sprite.fps:
@@ -578,44 +1275,249 @@ def bl_get_image(self):
     return s_get_image(self.sprite, self.rd["image_index"])
 
 
+def f_get_path(self):
+    # Return the path of the font file to use for the font, or None to
+    # use Pygame's default font.
+    if isinstance(self.name, str):
+        names = (self.name,)
+    else:
+        try:
+            names = tuple(self.name)
+        except TypeError:
+            # Most likely a non-iterable value, such as None, so we
+            # assume the default font is to be used.
+            names = ()
+
+    if names in _font_paths:
+        return _font_paths[names]
+
+    for name in names:
+        if os.path.isfile(name):
+            path = name
+            break
+        else:
+            path = pygame.font.match_font(name)
+            if path:
+                break
+    else:
+        path = pygame.font.match_font(','.join(FONT_DEFAULT_NAMES))
+
+    _font_paths[names] = path
+    return path
+
+
+def f_load(self, bold, italic, underline):
+    # Set the Pygame font used by the font to one with its size and the
+    # given style.  Pygame fonts are shared by all fonts using the same
+    # file, size, and style, so they must never be modified.
+    font = self.rd.get("font")
+    if font is not None and not isinstance(font, pygame.font.Font):
+        # Sprite fonts aren't shared, so they can just be changed.
+        font.set_bold(bold)
+        font.set_italic(italic)
+        font.set_underline(underline)
+        return
+
+    path = f_get_path(self)
+    i = ("font", path, self.size, bold, italic, underline)
+    font = cache.get(i)
+    if font is None:
+        font = pygame.font.Font(path, self.size)
+        font.set_bold(bold)
+        font.set_italic(italic)
+        font.set_underline(underline)
+
+    cache.add(i, font)
+    self.rd["font"] = font
+
+
 def f_split_text(self, text, width=None):
     # Split the text into lines of the proper size for ``width`` and
     # return a list of the lines.  If ``width`` is None, only
     # newlines split the text.
-    lines = text.splitlines()
-
     if width is None:
-        return lines
-    else:
+        return text.splitlines()
+
+    font = self.rd["font"]
+    i = ("text_split", font, self.size, font.get_bold(), font.get_italic(),
+         text, width)
+    split_text = cache.get(i)
+    if split_text is None:
         split_text = []
-        for line in lines:
-            if self.rd["font"].size(line)[0] <= width:
+        for line in text.splitlines():
+            if font.size(line)[0] <= width:
                 split_text.append(line)
             else:
-                if USE_UNISEG:
-                    words = list(line_break_units(line))
-                    jchar = ''
-                else:
-                    jchar = ' '
-                    words = line.split(jchar)
-
-                while words:
-                    current_line = words.pop(0)
-                    while self.rd["font"].size(current_line)[0] > width:
-                        start = ""
-                        while self.rd["font"].size(
-                                start + current_line[0])[0] <= width:
-                            start += current_line[0]
-                            current_line = current_line[1:]
-                        split_text.append(start)
-
-                    while (words and self.rd["font"].size(jchar.join(
-                            [current_line, words[0]]).rstrip())[0] <= width):
-                        current_line = jchar.join([current_line,
-                                                   words.pop(0)])
-                    split_text.append(current_line.rstrip())
-                        
-        return split_text
+                split_text.extend(f_wrap_line(self, line, width))
+        split_text = tuple(split_text)
+
+    cache.add(i, split_text)
+    return list(split_text)
+
+
+def f_wrap_line(self, line, width):
+    # Word-wrap a single line of text to ``width`` and return a list of
+    # the resulting lines.  Each distinct word is only measured once,
+    # and the width of a line is estimated by adding up the widths of
+    # its words.  Since kerning can make the real width differ slightly,
+    # the font is asked for the real width only where the estimate puts
+    # the end of a line.
+    size = self.rd["font"].size
+    if USE_UNISEG:
+        if SIMPLE_TEXT.fullmatch(line):
+            words = collections.deque(SIMPLE_TEXT_UNITS.findall(line))
+        else:
+            words = collections.deque(line_break_units(line))
+        jchar = ''
+    else:
+        jchar = ' '
+        words = collections.deque(line.split(jchar))
+    jwidth = size(jchar)[0] if jchar else 0
+
+    widths = {}
+
+    def get_width(word):
+        w = widths.get(word)
+        if w is None:
+            w = widths[word] = size(word)[0]
+        return w
+
+    split_text = []
+    while words:
+        current_line = words.popleft()
+        while True:
+            # Break up words which are too long to fit on a line.
+            k = f_fit_prefix(self, current_line, width)
+            if k >= len(current_line):
+                break
+            split_text.append(current_line[:k])
+            current_line = current_line[k:]
+
+        line_words = [current_line]
+        line_width = get_width(current_line)
+        while words:
+            word = words[0]
+            if (line_width + jwidth + get_width(word.rstrip()) > width and
+                    size(jchar.join(line_words + [word]).rstrip())[0] >
+                    width):
+                break
+            line_words.append(words.popleft())
+            line_width += jwidth + get_width(word)
+
+        current_line = jchar.join(line_words)
+        while (len(line_words) > 1 and
+               size(current_line.rstrip())[0] > width):
+            # The estimate was too small; move words to the next line
+            # until the line fits.
+            words.appendleft(line_words.pop())
+            current_line = jchar.join(line_words)
+
+        split_text.append(current_line.rstrip())
+
+    return split_text
+
+
+def f_fit_prefix(self, text, width):
+    # Return the length of the longest start of ``text`` which fits
+    # within ``width``, but at least 1 so that progress is always made.
+    # The length is found by doubling and then bisecting, so only starts
+    # of about the same length as the result are measured.
+    size = self.rd["font"].size
+    lo = 1
+    hi = 2
+    while hi <= len(text) and size(text[:hi])[0] <= width:
+        lo = hi
+        hi *= 2
+    hi = min(hi, len(text) + 1)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if size(text[:mid])[0] <= width:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def f_get_size(self, lines, width=None, height=None):
+    # Return the size of the already split ``lines`` of text, limited to
+    # ``width`` and ``height``, as a tuple in the form
+    # ``(width, height)``.
+    text_width = 0
+    for line in lines:
+        text_width = max(text_width, self.rd["font"].size(line)[0])
+    if lines:
+        text_height = self.rd["font"].get_linesize() * (len(lines) - 1)
+        text_height += self.rd["font"].size(lines[-1])[1]
+    else:
+        text_height = 0
+
+    if width is not None:
+        text_width = min(text_width, width)
+    if height is not None:
+        text_height = min(text_height, height)
+
+    return (text_width, text_height)
+
+
+def f_render_line(self, line, anti_alias, color, outline_thickness=0):
+    # Return a surface with the line of text rendered on it in
+    # ``color``, or an outline of the text that is ``outline_thickness``
+    # pixels thick if that is nonzero.  The outline surface is larger
+    # than the text by ``outline_thickness`` on every side.  Results are
+    # cached, so the returned surface must not be modified.
+    font = self.rd["font"]
+    sprite = getattr(font, "sprite", None)
+    drawcycle = sprite.rd["drawcycle"] if sprite is not None else None
+    i = ("text_line", font, self.size, font.get_bold(), font.get_italic(),
+         font.get_underline(), drawcycle, line, anti_alias, tuple(color),
+         outline_thickness)
+    surf = cache.get(i)
+    if surf is not None:
+        cache.add(i, surf)
+        return surf
+
+    pg_color = pygame.Color(*color)
+    if outline_thickness:
+        t = outline_thickness
+        # We exclude positions where the distance from the real text is
+        # greater than the outline thickness to create a round outline
+        # rather than a square one.
+        offsets = [(xx, yy) for xx in range(-t, t + 1)
+                   for yy in range(-t, t + 1)
+                   if math.sqrt(xx**2 + yy**2) <= t]
+        if anti_alias:
+            # A mask would lose the anti-aliased edges of the text, so
+            # the text is blitted at every position instead.
+            part = font.render(line, anti_alias, pg_color)
+            surf = pygame.Surface((part.get_width() + 2*t,
+                                   part.get_height() + 2*t), pygame.SRCALPHA)
+            surf.fill((0, 0, 0, 0))
+            for xx, yy in offsets:
+                surf.blit(part, (xx + t, yy + t))
+
+            if color.alpha < 255:
+                surf.fill((0, 0, 0, 255 - color.alpha), None,
+                          pygame.BLEND_RGBA_SUB)
+        else:
+            # Dilate the mask of the text with a disc the size of the
+            # outline, rather than blitting the text at every position
+            # in the disc.
+            mask = pygame.mask.from_surface(font.render(line, anti_alias,
+                                                        pg_color))
+            disc = pygame.mask.Mask((2*t + 1, 2*t + 1))
+            for xx, yy in offsets:
+                disc.set_at((xx + t, yy + t))
+            surf = mask.convolve(disc).to_surface(
+                setcolor=pg_color, unsetcolor=(0, 0, 0, 0))
+    else:
+        surf = font.render(line, anti_alias, pg_color)
+        if color.alpha < 255:
+            surf = surf.convert_alpha()
+            surf.fill((0, 0, 0, 255 - color.alpha), None,
+                      pygame.BLEND_RGBA_SUB)
+
+    cache.add(i, surf)
+    return surf
 
 
 def o_update(self, time_passed, delta_mult):
@@ -913,187 +1815,133 @@ def r_set_object_areas(self, update_objects=True):
 
 
 def r_update_fade(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
     if complete < 0.5:
         diff = (complete - self.rd["t_complete_last"]) * 2
-        c = sge.gfx.Color([round(diff * 255)] * 3)
-        darkener = sge.gfx.Sprite(width=w, height=h)
-        darkener.draw_rectangle(0, 0, w, h, fill=c)
-        transition_sprite.draw_sprite(darkener, 0, 0, 0,
-                                      blend_mode=sge.BLEND_RGB_SUBTRACT)
+        c = round(diff * 255)
+        surf.fill((c, c, c), None, pygame.BLEND_RGB_SUB)
     else:
+        if not self.rd["t_meta"]:
+            self.rd["t_meta"] = True
+            surf.fill((0, 0, 0, 255))
         complete = (complete - 0.5) * 2
-        c = sge.gfx.Color((0, 0, 0, round(255 - complete * 255)))
-        transition_sprite.draw_clear()
-        transition_sprite.draw_rectangle(0, 0, w, h, fill=c)
+        surf.set_alpha(round(255 - complete * 255))
 
 
 def r_update_dissolve(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
-    diff = complete - self.rd["t_complete_last"]
-    c = sge.gfx.Color((0, 0, 0, round(diff * 255)))
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_rectangle(0, 0, w, h, fill=c)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    surf.set_alpha(round(255 - complete * 255))
 
 
 def r_update_pixelate(self, complete):
-    global game_scale_method
-
     if not self.rd["t_meta"]:
         self.rd["t_meta"] = 0
     if not self.rd["t_arg"]:
         self.rd["t_arg"] = 0
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
-    scale_method = game_scale_method
-    game_scale_method = None
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
 
     if complete < 0.9:
         if self.rd["t_time_passed"] - self.rd["t_meta"] > self.rd["t_arg"]:
             self.rd["t_meta"] = self.rd["t_time_passed"]
-            transition_sprite = self.rd["t_sprite_original"].copy()
             complete /= 0.9
-            swidth = max(w / 20, w * (1 - complete))
-            sheight = max(h / 20, h * (1 - complete))
-            transition_sprite.size = swidth, sheight
-            transition_sprite.size = w, h
-            self.rd["t_sprite"] = transition_sprite
+            swidth = max(1, round(max(w / 20, w * (1 - complete))))
+            sheight = max(1, round(max(h / 20, h * (1 - complete))))
+            original = self.rd["t_sprite_original"].rd["baseimages"][0]
+            small = pygame.transform.scale(original, (swidth, sheight))
+            pygame.transform.scale(small, (w, h), surf)
     else:
-        diff = (complete - self.rd["t_complete_last"]) * 5
-        c = sge.gfx.Color((0, 0, 0, min(round(diff * 255), 255)))
-        eraser = sge.gfx.Sprite(width=w, height=h)
-        eraser.draw_rectangle(0, 0, w, h, fill=c)
-        transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                      blend_mode=sge.BLEND_RGBA_SUBTRACT)
-
-    game_scale_method = scale_method
+        complete = (complete - 0.9) * 10
+        surf.set_alpha(max(0, round(255 - complete * 255)))
 
 
 def r_update_wipe_left(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width * complete
-    x = transition_sprite.width - w
-    h = transition_sprite.height
-    transition_sprite.draw_erase(x, 0, w, h)
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
+    x = round(w - w * complete)
+    surf.fill((0, 0, 0, 0), (x, 0, w - x, h))
 
 
 def r_update_wipe_right(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width * complete
-    h = transition_sprite.height
-    transition_sprite.draw_erase(0, 0, w, h)
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
+    surf.fill((0, 0, 0, 0), (0, 0, round(w * complete), h))
 
 
 def r_update_wipe_up(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height * complete
-    y = transition_sprite.height - h
-    transition_sprite.draw_erase(0, y, w, h)
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
+    y = round(h - h * complete)
+    surf.fill((0, 0, 0, 0), (0, y, w, h - y))
 
 
 def r_update_wipe_down(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height * complete
-    transition_sprite.draw_erase(0, 0, w, h)
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
+    surf.fill((0, 0, 0, 0), (0, 0, w, round(h * complete)))
 
 
 def r_update_wipe_upleft(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
     x = w - w * complete * 2
     y = h - h * complete * 2
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_polygon([(w, h), (x, h), (w, y)],
-                        fill=sge.gfx.Color((0, 0, 0, 255)), anti_alias=True)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    pygame.draw.polygon(surf, (0, 0, 0, 0), [(w, h), (x, h), (w, y)])
 
 
 def r_update_wipe_upright(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
     x = w * complete * 2
     y = h - h * complete * 2
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_polygon([(0, h), (x, h), (0, y)],
-                        fill=sge.gfx.Color((0, 0, 0, 255)), anti_alias=True)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    pygame.draw.polygon(surf, (0, 0, 0, 0), [(0, h), (x, h), (0, y)])
 
 
 def r_update_wipe_downleft(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
     x = w - w * complete * 2
     y = h * complete * 2
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_polygon([(w, 0), (x, 0), (w, y)],
-                        fill=sge.gfx.Color((0, 0, 0, 255)), anti_alias=True)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    pygame.draw.polygon(surf, (0, 0, 0, 0), [(w, 0), (x, 0), (w, y)])
 
 
 def r_update_wipe_downright(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
     x = w * complete * 2
-    y = w * complete * 2
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_polygon([(0, 0), (x, 0), (0, y)],
-                        fill=sge.gfx.Color((0, 0, 0, 255)), anti_alias=True)
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    y = h * complete * 2
+    pygame.draw.polygon(surf, (0, 0, 0, 0), [(0, 0), (x, 0), (0, y)])
 
 
 def r_update_wipe_matrix(self, complete):
-    transition_sprite = self.rd["t_sprite"]
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
 
     if self.rd["t_arg"]:
-        pw, ph = self.rd["t_arg"]
+        pw, ph = map(int, self.rd["t_arg"])
     else:
         pw = 4
         ph = 4
 
-    w = transition_sprite.width
-    h = transition_sprite.height
-    mw = int(w / pw)
-    mh = int(h / ph)
-
-    remaining = self.rd["t_matrix_remaining"]
-    if remaining is None:
-        remaining = []
-        for x in range(mw):
-            for y in range(mh):
-                remaining.append((x, y))
-
-    diff = complete - self.rd["t_complete_last"]
-    new_erase = int(mw * mh * diff)
-    transition_sprite.draw_lock()
-    while new_erase > 0 and remaining:
-        new_erase -= 1
-        x, y = remaining.pop(random.randrange(len(remaining)))
-        transition_sprite.draw_erase(x * pw, y * ph, pw, ph)
-    transition_sprite.draw_unlock()
-    self.rd["t_matrix_remaining"] = remaining
+    # The cells are erased in an order shuffled once at the start, so
+    # that each update only has to erase the next few cells.
+    cells = self.rd["t_matrix"]
+    if cells is None:
+        w, h = surf.get_size()
+        cells = [(x, y) for x in range(0, w, pw) for y in range(0, h, ph)]
+        random.shuffle(cells)
+        self.rd["t_matrix"] = cells
+        self.rd["t_matrix_next"] = 0
+
+    start = self.rd["t_matrix_next"]
+    end = int(len(cells) * complete)
+    for x, y in cells[start:end]:
+        surf.fill((0, 0, 0, 0), (x, y, pw, ph))
+    self.rd["t_matrix_next"] = max(start, end)
 
 
 def r_update_iris_in(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
 
     if self.rd["t_arg"]:
         x, y = self.rd["t_arg"]
@@ -1103,24 +1951,32 @@ def r_update_iris_in(self, complete):
 
     r = int(math.hypot(max(x, sge.game.width - x),
                        max(y, sge.game.height - y)) * (1 - complete))
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser_eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser_eraser.draw_circle(x, y, r, fill=sge.gfx.Color((0, 0, 0, 255)))
 
-    eraser.draw_lock()
-    eraser.draw_rectangle(0, 0, w, h, fill=sge.gfx.Color((0, 0, 0, 255)))
-    eraser.draw_sprite(eraser_eraser, 0, 0, 0,
-                       blend_mode=sge.BLEND_RGBA_SUBTRACT)
-    eraser.draw_unlock()
-
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    # Everything outside of the circle's bounding box is erased
+    # directly.  Inside of it, the area outside of the circle is
+    # erased with a stencil drawn on a surface kept for the whole
+    # transition.
+    box = pygame.Rect(int(x - r), int(y - r), 2 * r + 1, 2 * r + 1)
+    box = box.clip(surf.get_rect())
+    clear = (0, 0, 0, 0)
+    surf.fill(clear, (0, 0, w, box.top))
+    surf.fill(clear, (0, box.bottom, w, h - box.bottom))
+    surf.fill(clear, (0, box.top, box.left, box.height))
+    surf.fill(clear, (box.right, box.top, w - box.right, box.height))
+
+    if box.width and box.height:
+        stencil = self.rd["t_scratch"]
+        if stencil is None:
+            stencil = pygame.Surface((w, h), pygame.SRCALPHA)
+            self.rd["t_scratch"] = stencil
+        stencil.fill((0, 0, 0, 255), box)
+        pygame.draw.circle(stencil, (0, 0, 0, 0), (int(x), int(y)), r)
+        surf.blit(stencil, box.topleft, box, pygame.BLEND_RGBA_SUB)
 
 
 def r_update_iris_out(self, complete):
-    transition_sprite = self.rd["t_sprite"]
-    w = transition_sprite.width
-    h = transition_sprite.height
+    surf = self.rd["t_sprite"].rd["baseimages"][0]
+    w, h = surf.get_size()
 
     if self.rd["t_arg"]:
         x, y = self.rd["t_arg"]
@@ -1130,10 +1986,638 @@ def r_update_iris_out(self, complete):
 
     r = int(math.hypot(max(x, sge.game.width - x),
                        max(y, sge.game.height - y)) * complete)
-    eraser = sge.gfx.Sprite(width=w, height=h)
-    eraser.draw_circle(x, y, r, fill=sge.gfx.Color((0, 0, 0, 255)))
-    transition_sprite.draw_sprite(eraser, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGBA_SUBTRACT)
+    pygame.draw.circle(surf, (0, 0, 0, 0), (int(x), int(y)), r)
+
+
+def r_update_custom(update, self, complete):
+    # Update a transition registered with sge.dsp.register_transition.
+    update(self.rd["t_sprite"], self.rd["t_sprite_original"], complete,
+           self.rd["t_arg"])
+
+
+# Functions updating each transition which can be used by
+# sge.dsp.Room.start, indexed by name.  Custom transitions are added by
+# sge.dsp.register_transition.
+game_transitions = {
+    "fade": r_update_fade, "dissolve": r_update_dissolve,
+    "pixelate": r_update_pixelate, "wipe_left": r_update_wipe_left,
+    "wipe_right": r_update_wipe_right, "wipe_up": r_update_wipe_up,
+    "wipe_down": r_update_wipe_down, "wipe_upleft": r_update_wipe_upleft,
+    "wipe_upright": r_update_wipe_upright,
+    "wipe_downleft": r_update_wipe_downleft,
+    "wipe_downright": r_update_wipe_downright,
+    "wipe_matrix": r_update_wipe_matrix, "iris_in": r_update_iris_in,
+    "iris_out": r_update_iris_out}
+
+
+def s_get_index_key(directory):
+    return os.path.normcase(os.path.abspath(directory or os.curdir))
+
+
+def s_get_index(directory):
+    # Return the index of the sprite files in ``directory``, scanning
+    # the directory if it has not been indexed yet.  Each file is listed
+    # under its name without the extension, and under the part of that
+    # before the last hyphen and underscore, if any.
+    i = s_get_index_key(directory)
+    index = _sprite_indexes.get(i)
+    if index is None:
+        index = {}
+        with os.scandir(directory or os.curdir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    root, ext = os.path.splitext(entry.name)
+                    names = {root}
+                    if '-' in root:
+                        names.add(root.rsplit('-', 1)[0])
+                    if '_' in root:
+                        names.add(root.rsplit('_', 1)[0])
+
+                    for name in names:
+                        index.setdefault(name, []).append(entry.name)
+
+        _sprite_indexes[i] = index
+        _sprite_index_misses[i] = set()
+
+    return index
+
+
+def s_clear_index(directory):
+    # Forget the index of ``directory`` so that it is scanned again the
+    # next time it is needed.
+    i = s_get_index_key(directory)
+    _sprite_indexes.pop(i, None)
+    _sprite_index_misses.pop(i, None)
+
+
+def s_find_files(name, directory):
+    # Return the image files of the sprite named ``name`` in
+    # ``directory`` as a tuple of ``(single, frames, strips)``, where
+    # ``single`` is a list of single-frame images, ``frames`` is a list
+    # of animation frames indexed by their number (with None for
+    # missing numbers), and ``strips`` is a list of sprite sheets.  If
+    # no files are found in an index made by an earlier scan, the
+    # directory is scanned again in case they were added since then;
+    # names still not found are remembered so that this is only done
+    # once for each of them until the index changes.
+    if not directory:
+        directory = os.curdir
+    i = s_get_index_key(directory)
+    scanned = i in _sprite_index_misses
+    files = s_search_index(name, directory)
+    if (not any(files) and scanned and i in _sprite_index_misses and
+            name not in _sprite_index_misses[i]):
+        s_clear_index(directory)
+        files = s_search_index(name, directory)
+
+    if not any(files) and i in _sprite_index_misses:
+        _sprite_index_misses[i].add(name)
+
+    return files
+
+
+def s_search_index(name, directory):
+    # Return the image files of the sprite named ``name`` listed in the
+    # index of ``directory``, as described for s_find_files.
+    fname_single = []
+    fname_frames = []
+    fname_strip = []
+
+    for fname in s_get_index(directory).get(name, ()):
+        full_fname = os.path.join(directory, fname)
+        suffix = s_split_name(name, fname)
+        if suffix is None:
+            continue
+
+        if not suffix:
+            fname_single.append(full_fname)
+        elif suffix.isdigit():
+            n = int(suffix)
+            while len(fname_frames) - 1 < n:
+                fname_frames.append(None)
+            fname_frames[n] = full_fname
+        elif s_get_strip_length(name, fname):
+            fname_strip.append(full_fname)
+
+    return fname_single, fname_frames, fname_strip
+
+
+def s_split_name(name, fname):
+    # Return the part of the name of the file ``fname`` (without its
+    # directory and extension) after the sprite name ``name`` and the
+    # hyphen or underscore which follows it, an empty string if the
+    # file is named just ``name``, or None if the file isn't named
+    # after the sprite at all.
+    root, ext = os.path.splitext(os.path.basename(fname))
+    if root == name:
+        return ''
+    for sep in '-_':
+        split = root.rsplit(sep, 1)
+        if len(split) == 2 and split[0] == name:
+            return split[1]
+
+    return None
+
+
+def s_get_strip_length(name, fname):
+    # Return the number of frames in the strip (sprite sheet) ``fname``
+    # of the sprite named ``name``, or None if the file isn't a strip of
+    # that sprite.
+    suffix = s_split_name(name, fname)
+    if (suffix is not None and suffix.startswith('strip') and
+            suffix[5:].isdigit() and int(suffix[5:]) > 0):
+        return int(suffix[5:])
+
+    return None
+
+
+def s_load_atlas(fname):
+    # Return the metadata and the converted image of the atlas described
+    # by the file ``fname``.  The image is shared by all sprites loaded
+    # from the atlas, which reference parts of it as subsurfaces.
+    i = os.path.normcase(os.path.abspath(fname))
+    index = _atlas_indexes.get(i)
+    if index is None:
+        with open(fname) as f:
+            index = json.load(f)
+        _atlas_indexes[i] = index
+
+    image = _atlas_images.get(i)
+    if image is None:
+        image = _load_image(os.path.join(os.path.dirname(fname),
+                                         index["image"]))
+        if (image.get_flags() & pygame.SRCALPHA or
+                image.get_colorkey() is not None):
+            image = image.convert_alpha()
+        else:
+            image = image.convert()
+        _atlas_images[i] = image
+
+    return index, image
+
+
+def s_pack_atlas(sizes):
+    # Arrange rectangles with the given sizes in one image by placing
+    # them in rows, tallest first.  Return a list of the position of
+    # each rectangle and the size of the image.
+    area = sum(w * h for w, h in sizes)
+    width = max([math.ceil(math.sqrt(area))] + [w for w, h in sizes])
+    positions = [None] * len(sizes)
+    x = 0
+    y = 0
+    row_height = 0
+    image_width = 0
+    for k in sorted(range(len(sizes)), key=lambda k: -sizes[k][1]):
+        w, h = sizes[k]
+        if x + w > width:
+            x = 0
+            y += row_height
+            row_height = 0
+
+        positions[k] = (x, y)
+        x += w
+        row_height = max(row_height, h)
+        image_width = max(image_width, x)
+
+    return positions, (image_width, y + row_height)
+
+
+def _get_asset_name(*params):
+    # Return the name of the asset cache file for ``params``.
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((ASSET_CACHE_VERSION,) + params).encode())
+    return h.hexdigest()
+
+
+def _read_asset(name):
+    # Return the header and a memory map of the data of the asset cache
+    # file ``name``, or ``(None, None)`` if there is no such file.  The
+    # memory map is copy-on-write, so surfaces using it can be changed.
+    try:
+        with open(os.path.join(_asset_cache_dir, name), "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        end = data.find(b"\n")
+        header = json.loads(data[:end].decode())
+    except (OSError, ValueError):
+        return None, None
+
+    return header, memoryview(data)[end + 1:]
+
+
+def _write_asset(name, header, chunks):
+    # Write an asset cache file consisting of the JSON ``header`` on
+    # one line followed by the bytes of each of ``chunks``.  The file is
+    # written under a temporary name first so that other processes
+    # never see it incomplete.
+    fname = os.path.join(_asset_cache_dir, name)
+    temp_fname = "{}.{}.tmp".format(fname, os.getpid())
+    try:
+        with open(temp_fname, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(temp_fname, fname)
+    except OSError as e:
+        warnings.warn("Could not write to the asset cache: {}".format(e))
+
+
+def _get_file_hash(fname):
+    # Return the hash of the contents of the file ``fname``.  The file
+    # is only read if its size or modification time changed since it
+    # was last hashed, by this process or (through the asset cache) an
+    # earlier one.
+    fname = os.path.abspath(fname)
+    st = os.stat(fname)
+    stamp = (st.st_size, st.st_mtime_ns)
+    entry = _asset_file_hashes.get(fname)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+
+    name = _get_asset_name("hash", fname, stamp)
+    header, data = _read_asset(name)
+    try:
+        digest = bytes.fromhex(header["hash"])
+    except (KeyError, TypeError, ValueError):
+        with open(fname, "rb") as f:
+            digest = hashlib.blake2b(f.read()).digest()
+        _write_asset(name, {"hash": digest.hex()}, [])
+
+    _asset_file_hashes[fname] = (stamp, digest)
+    return digest
+
+
+def s_get_asset_key(fnames, *params):
+    # Return the key of the images loaded from the files ``fnames``
+    # with the given parameters in the asset cache, based on the names
+    # and contents of the files.
+    h = hashlib.blake2b(digest_size=20)
+    for fname in fnames:
+        h.update(os.path.basename(fname).encode() + b"\0")
+        h.update(_get_file_hash(fname))
+
+    return _get_asset_name("images", h.hexdigest(), params)
+
+
+def s_read_asset_images(key):
+    # Return the images stored in the asset cache under ``key``, or an
+    # empty list if there are none.  The images use the memory-mapped
+    # file directly instead of copying it.
+    header, data = _read_asset(key)
+    images = []
+    if header is not None:
+        pos = 0
+        try:
+            for w, h, fmt in header["frames"]:
+                size = w * h * len(fmt)
+                images.append(pygame.image.frombuffer(
+                    data[pos:pos + size], (w, h), fmt))
+                pos += size
+        except (KeyError, TypeError, ValueError):
+            return []
+
+    return images
+
+
+def s_write_asset_images(key, images):
+    # Store ``images`` in the asset cache under ``key`` as raw pixels.
+    frames = []
+    chunks = []
+    for image in images:
+        fmt = "RGBA" if image.get_flags() & pygame.SRCALPHA else "RGB"
+        frames.append([image.get_width(), image.get_height(), fmt])
+        chunks.append(pygame.image.tostring(image, fmt))
+
+    _write_asset(key, {"frames": frames}, chunks)
+
+
+def s_read_asset_mask(key):
+    # Return the precise mask stored in the asset cache under ``key``,
+    # or None if there is none.
+    header, data = _read_asset(key)
+    if header is None:
+        return None
+
+    try:
+        w, h = header["size"]
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    if len(data) != w * h:
+        return None
+
+    return [list(map(bool, data[x * h:(x + 1) * h])) for x in range(w)]
+
+
+def s_write_asset_mask(key, mask):
+    # Store the precise mask ``mask`` in the asset cache under ``key``
+    # as one byte per pixel.
+    w = len(mask)
+    h = len(mask[0]) if mask else 0
+    _write_asset(key, {"size": [w, h]}, [bytes(column) for column in mask])
+
+
+def s_check_alpha(surface):
+    # Check whether the surface has a colorkey.  If it does, return the
+    # surface converted to use alpha transparency.  Otherwise, return
+    # the surface.
+    if surface.get_colorkey() is not None:
+        return surface.convert_alpha()
+
+    return surface
+
+
+class TileList(list):
+
+    # List used as the tiles of tile grids.  Changing a tile through it
+    # marks the tile as changed in every grid using the list (see
+    # tg_mark_dirty), so that chunks can be updated without comparing
+    # their tiles every frame.  Changes which add, remove, or reorder
+    # tiles mark every tile as changed.
+
+    def __init__(self, tiles=()):
+        super().__init__(tiles)
+        self.grids = weakref.WeakSet()
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def mark_dirty(self, k=None):
+        # Mark the tile at index ``k`` as changed, or all tiles if
+        # ``k`` is None.
+        for grid in list(self.grids):
+            if k is None:
+                tg_mark_dirty(grid)
+            else:
+                n = grid.section_length
+                tg_mark_dirty(grid, k % n, k // n)
+
+    def __setitem__(self, k, value):
+        length = len(self)
+        super().__setitem__(k, value)
+        if isinstance(k, slice):
+            if len(self) == length:
+                for j in range(*k.indices(length)):
+                    self.mark_dirty(j)
+            else:
+                self.mark_dirty()
+        else:
+            self.mark_dirty(k % length)
+
+    def __delitem__(self, k):
+        super().__delitem__(k)
+        self.mark_dirty()
+
+    def __iadd__(self, other):
+        result = super().__iadd__(other)
+        self.mark_dirty()
+        return result
+
+    def __imul__(self, n):
+        result = super().__imul__(n)
+        self.mark_dirty()
+        return result
+
+    def append(self, value):
+        super().append(value)
+        self.mark_dirty()
+
+    def extend(self, values):
+        super().extend(values)
+        self.mark_dirty()
+
+    def insert(self, k, value):
+        super().insert(k, value)
+        self.mark_dirty()
+
+    def pop(self, k=-1):
+        value = super().pop(k)
+        self.mark_dirty()
+        return value
+
+    def remove(self, value):
+        super().remove(value)
+        self.mark_dirty()
+
+    def clear(self):
+        super().clear()
+        self.mark_dirty()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.mark_dirty()
+
+    def reverse(self):
+        super().reverse()
+        self.mark_dirty()
+
+
+class LazyFrames:
+
+    # Sequence used as the base images of a sprite whose frames are
+    # decoded only when they are used.  ``sources`` has one item for
+    # each frame, ``(fname, part, parts)``, meaning the frame is part
+    # ``part`` of the image in ``fname`` split horizontally into
+    # ``parts`` parts.  At most ``max_loaded`` decoded frames are kept,
+    # least recently used first out, and the files of the ``prefetch``
+    # frames after each frame used are decoded in the background.
+    #
+    # Frames which are about to be drawn on are requested with keep()
+    # (see s_edit_frame) and kept from then on, so that the drawing is
+    # never lost.  Changing the number or order of the frames loads all
+    # of them into an ordinary list which is used instead.
+
+    def __init__(self, rd, sources, max_loaded, prefetch):
+        self.rd = rd
+        self.sources = sources
+        self.max_loaded = max(2, max_loaded)
+        self.prefetch = prefetch
+        self.size = None
+        self.images = None
+        self.loaded = collections.OrderedDict()
+        self.kept = {}
+        self.pending = {}
+        self.sheet = (None, None)
+
+    def __len__(self):
+        if self.images is not None:
+            return len(self.images)
+        return len(self.sources)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if self.images is not None:
+            return self.images[i]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+
+        image = self.kept.get(i)
+        if image is None:
+            image = self.loaded.get(i)
+            if image is None:
+                if not 0 <= i < len(self.sources):
+                    raise IndexError("Frame index out of range.")
+                image = self.load(i)
+                self.loaded[i] = image
+                while (len(self.loaded) > self.max_loaded and
+                       not self.rd["locked"]):
+                    self.loaded.popitem(last=False)
+            else:
+                self.loaded.move_to_end(i)
+
+        if self.prefetch:
+            self.start_prefetch(i)
+
+        return image
+
+    def __setitem__(self, i, image):
+        if self.images is not None:
+            self.images[i] = image
+        else:
+            if i < 0:
+                i += len(self)
+            self.loaded.pop(i, None)
+            self.kept[i] = image
+
+    def __delitem__(self, i):
+        del self.get_images()[i]
+
+    def append(self, image):
+        self.get_images().append(image)
+
+    def insert(self, i, image):
+        self.get_images().insert(i, image)
+
+    def extend(self, images):
+        self.get_images().extend(images)
+
+    def get_images(self):
+        # Switch to keeping all frames in an ordinary list.
+        if self.images is None:
+            self.images = [self[i] for i in range(len(self.sources))]
+            self.loaded.clear()
+            self.kept.clear()
+            self.pending.clear()
+            self.sheet = (None, None)
+
+        return self.images
+
+    def keep(self, i):
+        # Return frame ``i``, keeping it from now on since it is about
+        # to be changed.
+        image = self[i]
+        if self.images is None:
+            if i < 0:
+                i += len(self)
+            self.loaded.pop(i, None)
+            self.kept[i] = image
+
+        return image
+
+    def set_size(self, width, height):
+        # Set the size to scale frames to.  Frames which have been kept
+        # are scaled right away; the others are loaded again.
+        if self.images is not None:
+            for i in range(len(self.images)):
+                self.images[i] = s_scale_frame(self.images[i], width,
+                                               height)
+            return
+
+        self.size = (width, height)
+        for i in self.kept:
+            self.kept[i] = s_scale_frame(self.kept[i], width, height)
+        for i in list(self.loaded):
+            if self.loaded[i].get_size() != self.size:
+                del self.loaded[i]
+
+    def load(self, i):
+        # Decode frame ``i``.
+        fname, part, parts = self.sources[i]
+        if parts == 1:
+            image = s_check_alpha(self.load_file(fname))
+        else:
+            if self.sheet[0] != fname:
+                self.sheet = (fname, s_check_alpha(self.load_file(fname)))
+
+            sheet = self.sheet[1]
+            img_w = max(1, sheet.get_width()) // parts
+            img_h = max(1, sheet.get_height())
+            image = pygame.Surface((img_w, img_h), sheet.get_flags())
+            image.blit(sheet, (int(-part * img_w), 0))
+
+        if self.size is not None and image.get_size() != self.size:
+            image = s_scale_frame(image, *self.size)
+
+        return image
+
+    def load_file(self, fname):
+        # Return the image in ``fname``, decoded by the prefetch thread
+        # if it has been requested.
+        future = self.pending.pop(fname, None)
+        if future is not None:
+            return future.result()
+        return _load_image(fname)
+
+    def start_prefetch(self, i):
+        # Start decoding the files of the frames after frame ``i``, and
+        # forget files which were requested for other frames.
+        global _prefetch_executor
+
+        fnames = []
+        for j in range(i + 1, i + 1 + self.prefetch):
+            j %= len(self.sources)
+            fname = self.sources[j][0]
+            if (j not in self.kept and j not in self.loaded and
+                    fname != self.sheet[0] and fname not in fnames):
+                fnames.append(fname)
+
+        for fname in list(self.pending):
+            if fname not in fnames:
+                del self.pending[fname]
+
+        for fname in fnames:
+            if fname not in self.pending:
+                # Use the image loaded by sge.dsp.preload if there is
+                # one rather than decoding the file again.
+                future = _preloads.pop(_get_preload_key("image", fname),
+                                       None)
+                if future is None:
+                    if _prefetch_executor is None:
+                        _prefetch_executor = (
+                            concurrent.futures.ThreadPoolExecutor(
+                                max_workers=2))
+                    future = _prefetch_executor.submit(pygame.image.load,
+                                                       fname)
+                self.pending[fname] = future
+
+
+def s_scale_frame(image, width, height):
+    # Return ``image`` scaled to ``width`` by ``height`` with the scale
+    # method of the game.
+    if sge.game.scale_method == "smooth":
+        try:
+            return pygame.transform.smoothscale(image, (width, height))
+        except (pygame.error, ValueError):
+            return pygame.transform.scale(image, (width, height))
+    elif sge.game.scale_method == "scale2x":
+        new_surf = image
+        while (width > new_surf.get_width() or
+               height > new_surf.get_height()):
+            try:
+                new_surf = pygame.transform.scale2x(new_surf)
+            except pygame.error:
+                break
+
+        if new_surf.get_width() != width or new_surf.get_height() != height:
+            new_surf = pygame.transform.scale(image, (width, height))
+
+        return new_surf
+    else:
+        return pygame.transform.scale(image, (width, height))
 
 
 def s_set_size(self):
@@ -1143,31 +2627,13 @@ def s_set_size(self):
     # ``height`` are set.
     width = round(self.width)
     height = round(self.height)
-    for i in range(self.frames):
-        if sge.game.scale_method == "smooth":
-            try:
-                self.rd["baseimages"][i] = pygame.transform.smoothscale(
-                    self.rd["baseimages"][i], (width, height))
-            except (pygame.error, ValueError):
-                self.rd["baseimages"][i] = pygame.transform.scale(
-                    self.rd["baseimages"][i], (width, height))
-        elif sge.game.scale_method == "scale2x":
-            new_surf = self.rd["baseimages"][i]
-            while (width > new_surf.get_width() or
-                   height > new_surf.get_height()):
-                try:
-                    new_surf = pygame.transform.scale2x(new_surf)
-                except pygame.error:
-                    break
+    if isinstance(self.rd["baseimages"], LazyFrames):
+        self.rd["baseimages"].set_size(width, height)
+        return
 
-            if new_surf.get_width() != width or new_surf.get_height() != height:
-                new_surf = pygame.transform.scale(self.rd["baseimages"][i],
-                                                  (width, height))
-
-            self.rd["baseimages"][i] = new_surf
-        else:
-            self.rd["baseimages"][i] = pygame.transform.scale(
-                self.rd["baseimages"][i], (width, height))
+    for i in range(self.frames):
+        self.rd["baseimages"][i] = s_scale_frame(self.rd["baseimages"][i],
+                                                 width, height)
 
 
 def s_refresh(self):
@@ -1177,6 +2643,17 @@ def s_refresh(self):
         self.rd["drawcycle"] %= 999999999999999
 
 
+def s_edit_frame(self, num):
+    # Return frame ``num`` of the sprite so that it can be drawn on.
+    # This must be used instead of indexing the base images directly
+    # when changing a frame in place, so that frames of sprites loaded
+    # with a frame cache are kept rather than reloaded from the file.
+    images = self.rd["baseimages"]
+    if isinstance(images, LazyFrames):
+        return images.keep(num)
+    return images[num]
+
+
 def s_set_transparency(self, image):
     # Return a copy of the surface with transparency properly set
     # for this sprite's settings.
@@ -1202,46 +2679,26 @@ def s_get_image(self, num, xscale=1, yscale=1, rotation=0, alpha=255,
         if blend_mode is None:
             blend_mode = sge.BLEND_RGB_MULTIPLY
 
+        xscale, yscale, rotation, alpha = s_snap_transform(
+            self, xscale, yscale, rotation, alpha)
+
+        if blend is None and self.rd["baked"]:
+            if self.rd["baked_drawcycle"] == self.rd["drawcycle"]:
+                img = self.rd["baked"].get((num, xscale, yscale, rotation,
+                                            alpha))
+                if img is not None:
+                    return img
+            else:
+                # The sprite has changed since it was baked.
+                self.rd["baked"] = {}
+
         i = ("s_image", weakref.ref(self), self.rd["drawcycle"], num, xscale,
              yscale, rotation, alpha,
              tuple(blend) if blend is not None else None, blend_mode)
         img = cache.get(i)
         if img is None:
-            if xscale != 0 and yscale != 0:
-                img = s_set_transparency(self, self.rd["baseimages"][num])
-                xflip = xscale < 0
-                yflip = yscale < 0
-                img = pygame.transform.flip(img, xflip, yflip)
-                img = _scale(img, self.width * abs(xscale),
-                             self.height * abs(yscale))
-
-                if rotation != 0:
-                    img = pygame.transform.rotate(img, -rotation)
-
-                alpha = int(alpha)
-                if alpha < 255:
-                    if img.get_flags() & pygame.SRCALPHA:
-                        # Have to do this the more difficult way.
-                        img.fill((255, 255, 255, alpha), None,
-                                 pygame.BLEND_RGBA_MULT)
-                    else:
-                        img.set_alpha(alpha, pygame.RLEACCEL)
-
-                if blend is not None:
-                    pygame_flags = _get_blend_flags(blend_mode)
-                    if blend_mode == sge.BLEND_RGB_SCREEN:
-                        ssurf = pygame.Surface(img.get_size(), pygame.SRCALPHA)
-                        ssurf.fill(pygame.Color(*blend))
-                        _screen_blend(img, ssurf, 0, 0, False)
-                    elif blend_mode == sge.BLEND_RGBA_SCREEN:
-                        ssurf = pygame.Surface(img.get_size(), pygame.SRCALPHA)
-                        ssurf.fill(pygame.Color(*blend))
-                        _screen_blend(img, ssurf, 0, 0, True)
-                    else:
-                        img.fill(pygame.Color(*blend), None, pygame_flags)
-            else:
-                img = pygame.Surface((1, 1))
-                img.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+            img = s_transform_image(self, num, xscale, yscale, rotation,
+                                    alpha, blend, blend_mode)
 
         cache.add(i, img)
         return img
@@ -1249,12 +2706,221 @@ def s_get_image(self, num, xscale=1, yscale=1, rotation=0, alpha=255,
         return self
 
 
+def s_transform_image(self, num, xscale, yscale, rotation, alpha, blend,
+                      blend_mode):
+    # Return a new surface of the given frame with the given
+    # transformations applied, in the order of flip, scale, rotation,
+    # alpha, and blend.
+    if xscale != 0 and yscale != 0:
+        img = s_set_transparency(self, self.rd["baseimages"][num])
+        xflip = xscale < 0
+        yflip = yscale < 0
+        img = pygame.transform.flip(img, xflip, yflip)
+        img = _scale(img, self.width * abs(xscale),
+                     self.height * abs(yscale))
+
+        if rotation != 0:
+            img = pygame.transform.rotate(img, -rotation)
+
+        alpha = int(alpha)
+        if alpha < 255:
+            if img.get_flags() & pygame.SRCALPHA:
+                # Have to do this the more difficult way.
+                img.fill((255, 255, 255, alpha), None,
+                         pygame.BLEND_RGBA_MULT)
+            else:
+                img.set_alpha(alpha, pygame.RLEACCEL)
+
+        if blend is not None:
+            pygame_flags = _get_blend_flags(blend_mode)
+            if blend_mode == sge.BLEND_RGB_SCREEN:
+                ssurf = pygame.Surface(img.get_size(), pygame.SRCALPHA)
+                ssurf.fill(pygame.Color(*blend))
+                _screen_blend(img, ssurf, 0, 0, False)
+            elif blend_mode == sge.BLEND_RGBA_SCREEN:
+                ssurf = pygame.Surface(img.get_size(), pygame.SRCALPHA)
+                ssurf.fill(pygame.Color(*blend))
+                _screen_blend(img, ssurf, 0, 0, True)
+            else:
+                img.fill(pygame.Color(*blend), None, pygame_flags)
+    else:
+        img = pygame.Surface((1, 1))
+        img.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+
+    return img
+
+
+def s_get_converted(self, num=0):
+    # Return frame ``num`` converted to the display format with the
+    # sprite's transparency applied.  The result is kept until the
+    # sprite changes, so this is much faster than s_set_transparency
+    # for surfaces that are blitted repeatedly, like tiles.
+    converted = self.rd["converted"]
+    entry = converted.get(num)
+    if entry is not None and entry[0] == self.rd["drawcycle"]:
+        return entry[1]
+
+    img = s_set_transparency(self, self.rd["baseimages"][num])
+    converted[num] = (self.rd["drawcycle"], img)
+    return img
+
+
+def s_get_pixel_view(self, num):
+    # Return a NumPy array referencing the pixels of frame ``num``
+    # directly, indexed as ``[x, y, channel]`` with channels in RGBA
+    # order.  The frame is converted to a 32-bit RGBA surface first if
+    # it isn't one already.  The frame stays locked for as long as the
+    # array exists.
+    if sys.byteorder == "little":
+        masks = (0xFF, 0xFF00, 0xFF0000, 0xFF000000)
+    else:
+        masks = (0xFF000000, 0xFF0000, 0xFF00, 0xFF)
+
+    surf = s_edit_frame(self, num)
+    if (surf.get_bitsize() != 32 or surf.get_masks() != masks or
+            not surf.get_flags() & pygame.SRCALPHA):
+        fmt = pygame.Surface((1, 1), pygame.SRCALPHA, 32, masks)
+        surf = surf.convert(fmt)
+        self.rd["baseimages"][num] = surf
+
+    raw = numpy.frombuffer(surf.get_buffer(), numpy.uint8)
+    return numpy.lib.stride_tricks.as_strided(
+        raw, (surf.get_width(), surf.get_height(), 4),
+        (4, surf.get_pitch(), 1))
+
+
+def s_get_pixel_copy(self, num):
+    # Return a NumPy array with a copy of the pixels of frame ``num``,
+    # in the same form as s_get_pixel_view, without changing the frame.
+    surf = self.rd["baseimages"][num]
+    pixels = numpy.empty((surf.get_width(), surf.get_height(), 4),
+                         numpy.uint8)
+    pixels[:, :, :3] = pygame.surfarray.array3d(surf)
+    pixels[:, :, 3] = pygame.surfarray.array_alpha(surf)
+    if surf.get_colorkey() is not None:
+        pixels[:, :, 3] &= pygame.surfarray.array_colorkey(surf)
+
+    return pixels
+
+
+def s_remap_colors(self, num, colors):
+    # Replace the colors of frame ``num`` in one pass.  ``colors`` is a
+    # dictionary mapping old RGBA tuples to new RGBA tuples.
+    surf = s_edit_frame(self, num)
+
+    if (surf.get_bitsize() == 8 and
+            all(new[3] == 255 for new in colors.values())):
+        # Indexed image; just change the palette.
+        palette = surf.get_palette()
+        new_palette = []
+        for entry in palette:
+            entry = (entry.r, entry.g, entry.b, 255)
+            new_palette.append(colors.get(entry, entry)[:3])
+        surf.set_palette(new_palette)
+    elif USE_NUMPY:
+        pixels = s_get_pixel_view(self, num)
+        channels = pixels.astype(numpy.uint32)
+        keys = (channels[:, :, 0] | (channels[:, :, 1] << 8) |
+                (channels[:, :, 2] << 16) | (channels[:, :, 3] << 24))
+        del channels
+
+        old_keys = numpy.array(
+            [c[0] | (c[1] << 8) | (c[2] << 16) | (c[3] << 24)
+             for c in colors], numpy.uint32)
+        new_colors = numpy.array(list(colors.values()), numpy.uint8)
+        order = numpy.argsort(old_keys)
+        old_keys = old_keys[order]
+        new_colors = new_colors[order]
+
+        indexes = numpy.searchsorted(old_keys, keys)
+        indexes = numpy.minimum(indexes, len(old_keys) - 1)
+        matches = old_keys[indexes] == keys
+        pixels[matches] = new_colors[indexes[matches]]
+        del pixels
+    else:
+        # map_rgb can return negative numbers, but PixelArray uses
+        # unsigned ones.
+        bits = (1 << surf.get_bitsize()) - 1
+        mapped = {surf.map_rgb(old) & bits: surf.map_rgb(new) & bits
+                  for old, new in colors.items()
+                  if tuple(surf.unmap_rgb(surf.map_rgb(old))) == old}
+        surf.lock()
+        pixarray = pygame.PixelArray(surf)
+        for x in range(surf.get_width()):
+            for y in range(surf.get_height()):
+                new = mapped.get(pixarray[x, y])
+                if new is not None:
+                    pixarray[x, y] = new
+        pixarray.close()
+        surf.unlock()
+
+
+def s_snap_transform(self, xscale, yscale, rotation, alpha):
+    # Return ``xscale``, ``yscale``, ``rotation`` and ``alpha``
+    # rounded to the nearest steps set for the sprite, so that slightly
+    # different transformations can share the same image.
+    step = self.scale_step
+    if step:
+        if xscale:
+            xscale = math.copysign(
+                max(step, round(abs(xscale) / step) * step), xscale)
+        if yscale:
+            yscale = math.copysign(
+                max(step, round(abs(yscale) / step) * step), yscale)
+
+    step = self.rotation_step
+    if step:
+        rotation = (round(rotation / step) * step) % 360
+
+    step = self.alpha_step
+    if step:
+        alpha = min(255, round(alpha / step) * step)
+
+    return xscale, yscale, rotation, alpha
+
+
+def s_bake(self, rotations, xscales, yscales, alphas):
+    # Generate and store every combination of the given
+    # transformations for every frame.
+    baked = {}
+    for num in range(self.frames):
+        for xscale in xscales:
+            for yscale in yscales:
+                for rotation in rotations:
+                    for alpha in alphas:
+                        key = ((num,) + s_snap_transform(
+                            self, xscale, yscale, rotation, alpha))
+                        if key not in baked:
+                            baked[key] = s_transform_image(
+                                self, *key, None, sge.BLEND_RGB_MULTIPLY)
+
+    self.rd["baked"] = baked
+    self.rd["baked_drawcycle"] = self.rd["drawcycle"]
+
+
 def s_get_precise_mask(self, num, xscale, yscale, rotation):
     # Return a precise mask (2D list of True/False values) for the
     # given image index.
+    xscale, yscale, rotation, alpha = s_snap_transform(
+        self, xscale, yscale, rotation, 255)
     i = ("s_mask", weakref.ref(self), self.width, self.height,
          self.rd["drawcycle"], num, xscale, yscale, rotation)
     mask = cache.get(i)
+    asset_key = None
+    if mask is None and _asset_cache_dir is not None:
+        # Only masks of transformations limited to a fixed set of values
+        # are saved, since arbitrary ones would fill the asset cache
+        # with files which are unlikely to ever be used again.
+        asset = self.rd.get("asset")
+        fixed = ((abs(xscale) == abs(yscale) == 1 or self.scale_step) and
+                 (not rotation or self.rotation_step))
+        if (fixed and asset is not None and
+                asset[1] == self.rd["drawcycle"]):
+            asset_key = _get_asset_name(
+                "mask", asset[0], str(self.transparent), num, xscale, yscale,
+                rotation)
+            mask = s_read_asset_mask(asset_key)
+
     if mask is None:
         image = s_set_transparency(self, self.rd["baseimages"][num])
         xflip = xscale < 0
@@ -1281,6 +2947,9 @@ def s_get_precise_mask(self, num, xscale, yscale, rotation):
                     mask[x].append(image.get_at((x, y)) == colorkey)
         image.unlock()
 
+        if asset_key is not None:
+            s_write_asset_mask(asset_key, mask)
+
     cache.add(i, mask)
     return mask
 
@@ -1311,62 +2980,195 @@ def s_from_text(cls, font, text, width, height, color, halign, valign,
 def tg_blit(self, dest, x, y):
     # Blit the tile grid onto a Pygame surface.
     # Note: origin is NOT taken into account here!
-    def get_tile(i, j):
-        return self.tiles[i + j * self.section_length]
-
-    sx = x
-    sy = y
-
-    if self.render_method == "isometric":
-        x = -int(sx / self.tile_width)
-        imin = max(0, x)
-        imax = min(self.section_length,
-                   x + int(math.ceil(dest.get_width() / self.tile_width)) + 1)
-
-        h = self.tile_height / 2
-        y = -int(sy / h)
-        jmin = max(0, y)
-        jmax = min(int(len(self.tiles) // self.section_length),
-                   y + int(math.ceil(dest.get_height() / h)) + 1)
+    if (self.chunk_size and
+            self.render_method not in {"isometric", "hexagonal", "isohex"}):
+        tg_blit_chunks(self, dest, x, y)
+        return
+
+    for i, j, tile_x, tile_y in tg_get_visible(self, x, y, dest.get_width(),
+                                               dest.get_height()):
+        sprite = self.tiles[i + j*self.section_length]
+        if sprite is not None:
+            dest.blit(s_get_converted(sprite), (int(tile_x), int(tile_y)))
+
+
+def tg_get_span(origin, step, size, extent, count):
+    # Return the range of indexes of a line of ``count`` tiles, each
+    # ``size`` long and ``step`` apart starting at ``origin``, which
+    # overlap the span from 0 to ``extent``.
+    if step <= 0:
+        return range(count)
+    start = max(0, math.floor((-origin - size) / step) + 1)
+    end = min(count, math.ceil((extent - origin) / step))
+    return range(start, end)
+
+
+def tg_get_visible(self, x, y, width, height):
+    # Yield ``(i, j, tile_x, tile_y)`` for each tile position of the
+    # grid, drawn at ``(x, y)``, which overlaps the rectangle from
+    # ``(0, 0)`` to ``(width, height)``.  Positions are yielded column
+    # by column, which is the order tiles are drawn in.
+    tw = self.tile_width
+    th = self.tile_height
+    cols = self.section_length
+    rows = len(self.tiles) // cols
+
+    if self.render_method in {"isometric", "isohex"}:
+        # Odd rows are shifted right by half a tile, so each row parity
+        # has its own column span.
+        if self.render_method == "isometric":
+            row_step = th / 2
+        else:
+            row_step = th - self.meta
+        jrng = tg_get_span(y, row_step, th, height, rows)
+        spans = (tg_get_span(x, tw, tw, width, cols),
+                 tg_get_span(x + tw/2, tw, tw, width, cols))
+        for i in range(min(spans[0].start, spans[1].start),
+                       max(spans[0].stop, spans[1].stop)):
+            for j in jrng:
+                if i in spans[j % 2]:
+                    yield (i, j, x + i*tw + (j % 2) * tw/2, y + j*row_step)
+    elif self.render_method == "hexagonal":
+        # Odd columns are shifted down by half a tile, so each column
+        # parity has its own row span.
+        col_step = tw - self.meta
+        spans = (tg_get_span(y, th, th, height, rows),
+                 tg_get_span(y + th/2, th, th, height, rows))
+        for i in tg_get_span(x, col_step, tw, width, cols):
+            for j in spans[i % 2]:
+                yield (i, j, x + i*col_step, y + j*th + (i % 2) * th/2)
     else:
-        x = -int(sx / self.tile_width)
-        imin = max(0, x)
-        imax = min(self.section_length,
-                   x + int(math.ceil(dest.get_width() / self.tile_width)) + 1)
-
-        y = -int(sy / self.tile_height)
-        jmin = max(0, y)
-        jmax = min(int(len(self.tiles) // self.section_length),
-                   y + int(math.ceil(dest.get_height() / self.tile_height)) + 1)
-
-    irng = range(imin, imax)
-    jrng = range(jmin, jmax)
-
-    for i in irng:
-        for j in jrng:
-            sprite = get_tile(i, j)
+        jrng = tg_get_span(y, th, th, height, rows)
+        for i in tg_get_span(x, tw, tw, width, cols):
+            for j in jrng:
+                yield (i, j, x + i*tw, y + j*th)
+
+
+def tg_blit_chunks(self, dest, x, y):
+    # Blit an orthogonal tile grid onto a Pygame surface using
+    # pre-rendered chunks of tiles.
+    cw = self.chunk_size * self.tile_width
+    ch = self.chunk_size * self.tile_height
+    rows = math.ceil(len(self.tiles) / self.section_length)
+    cimin = max(0, math.floor(-x / cw))
+    cjmin = max(0, math.floor(-y / ch))
+    cimax = min(math.ceil(self.section_length / self.chunk_size),
+                math.ceil((dest.get_width() - x) / cw))
+    cjmax = min(math.ceil(rows / self.chunk_size),
+                math.ceil((dest.get_height() - y) / ch))
+
+    for cj in range(cjmin, cjmax):
+        for ci in range(cimin, cimax):
+            surf = tg_get_chunk(self, ci, cj)
+            if surf is not None:
+                dest.blit(surf, (int(x + ci*cw), int(y + cj*ch)))
+
+
+def tg_get_chunk(self, ci, cj):
+    # Return the pre-rendered surface of the chunk at column ``ci`` and
+    # row ``cj`` of chunks, rendering it if it isn't cached or any of its
+    # tiles have been marked as changed with tg_mark_dirty.  Returns None
+    # if the chunk has no tiles.
+    n = self.chunk_size
+    imin = ci * n
+    imax = min(imin + n, self.section_length)
+    jmin = cj * n
+    jmax = min(jmin + n, math.ceil(len(self.tiles) / self.section_length))
+
+    i = ("tg_chunk", weakref.ref(self), self.rd["tiles_version"],
+         len(self.tiles), self.section_length, n, self.tile_width,
+         self.tile_height, ci, cj)
+    chunk = cache.get(i)
+    dirty = self.rd["dirty_tiles"].pop((n, ci, cj), None)
+    if chunk is not None:
+        surf, drawcycles = chunk
+        if (all(sprite.rd["drawcycle"] == drawcycle
+                for sprite, drawcycle in drawcycles) and
+                (not dirty or surf is not None)):
+            if dirty:
+                # Only redraw the tiles changed through the mutation API.
+                sprites = {id(sprite) for sprite, drawcycle in drawcycles}
+                for ti, tj in dirty:
+                    sprite = self.tiles[ti + tj*self.section_length]
+                    rect = ((ti - imin) * self.tile_width,
+                            (tj - jmin) * self.tile_height,
+                            self.tile_width, self.tile_height)
+                    surf.fill((0, 0, 0, 0), rect)
+                    if sprite is not None:
+                        surf.blit(s_get_converted(sprite), rect[:2])
+                        if id(sprite) not in sprites:
+                            sprites.add(id(sprite))
+                            drawcycles.append(
+                                (sprite, sprite.rd["drawcycle"]))
+
+            cache.add(i, chunk)
+            return surf
+
+    sprites = {}
+    for j in range(jmin, jmax):
+        for sprite in self.tiles[imin + j*self.section_length:
+                                 imax + j*self.section_length]:
             if sprite is not None:
-                if self.render_method == "isometric":
-                    x = sx + i*self.tile_width
-                    y = sx + j*self.tile_height/2
-                    if j % 2 != 0:
-                        x += self.tile_width / 2
-                elif self.render_method == "hexagonal":
-                    x = sx + i * (self.tile_width - self.meta)
-                    y = sy + j*self.tile_height
-                    if i % 2 != 0:
-                        y += self.tile_height / 2
-                elif self.render_method == "isohex":
-                    x = sx + i*self.tile_width
-                    y = sx + j * (self.tile_height - self.meta)
-                    if j % 2 != 0:
-                        x += self.tile_width / 2
-                else:
-                    x = sx + i*self.tile_width
-                    y = sy + j*self.tile_height
-
-                ssurf = s_set_transparency(sprite, sprite.rd["baseimages"][0])
-                dest.blit(ssurf, (int(x), int(y)))
+                sprites[id(sprite)] = sprite
+
+    if sprites:
+        surf = pygame.Surface(((imax - imin) * self.tile_width,
+                               (jmax - jmin) * self.tile_height),
+                              pygame.SRCALPHA)
+        surf.fill((0, 0, 0, 0))
+        for j in range(jmin, jmax):
+            row = self.tiles[imin + j*self.section_length:
+                             imax + j*self.section_length]
+            for i_, sprite in enumerate(row):
+                if sprite is not None:
+                    surf.blit(s_get_converted(sprite),
+                              (i_ * self.tile_width,
+                               (j - jmin) * self.tile_height))
+        surf = surf.convert_alpha()
+    else:
+        surf = None
+
+    drawcycles = [(sprite, sprite.rd["drawcycle"])
+                  for sprite in sprites.values()]
+    cache.add(i, (surf, drawcycles))
+    return surf
+
+
+def tg_mark_dirty(self, i=None, j=None):
+    # Record that the tile at column ``i`` and row ``j`` has changed so
+    # that the chunk containing it can be updated without redrawing the
+    # whole chunk.  If ``i`` or ``j`` is None, every chunk is rendered
+    # again instead.
+    if i is None or j is None:
+        self.rd["tiles_version"] += 1
+        self.rd["dirty_tiles"].clear()
+        return
+
+    n = self.chunk_size
+    if n:
+        dirty = self.rd["dirty_tiles"]
+        if self.rd.get("dirty_chunk_size") != n:
+            # The chunk size changed, so old chunks won't be used again.
+            dirty.clear()
+            self.rd["dirty_chunk_size"] = n
+        dirty.setdefault((n, i // n, j // n), set()).add((i, j))
+
+
+def v_get_surface(self, like):
+    # Return the surface to draw the view onto.  The same surface is
+    # reused every frame unless the view's size or the format of
+    # ``like`` (the display surface) changes.
+    width = max(1, int(self.width))
+    height = max(1, int(self.height))
+    surf = self.rd.get("surface")
+    if (surf is None or surf.get_width() != width or
+            surf.get_height() != height or
+            surf.get_bitsize() != like.get_bitsize() or
+            surf.get_masks() != like.get_masks()):
+        surf = pygame.Surface((width, height), 0, like)
+        self.rd["surface"] = surf
+
+    return surf
 
 
 def v_limit(self):
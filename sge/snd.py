@@ -29,7 +29,7 @@ import pygame
 
 import sge
 from sge import r
-from sge.r import _get_channel, _release_channel
+from sge.r import _get_channel, _release_channel, _load_sound
 
 
 class Sound:
@@ -161,7 +161,7 @@ class Sound:
 
         if fname is not None and pygame.mixer.get_init():
             try:
-                self.__sound = pygame.mixer.Sound(fname)
+                self.__sound = _load_sound(fname)
             except pygame.error as e:
                 fname = None
                 self.__sound = None